@@ -0,0 +1,271 @@
+"""
+Batch Runner
+Processes many PowerPoint decks with a pool of warm StoryboardGenerator workers
+"""
+
+import gc
+import glob
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+# One warm generator per worker process
+_worker_generator = None
+
+
+def expand_inputs(inputs: List[str]) -> List[str]:
+    """
+    Resolve files, directories and glob patterns to a sorted list of .pptx paths
+
+    Directories are searched recursively.
+    """
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, "**", "*.pptx"), recursive=True)
+        elif glob.has_magic(item):
+            matches = glob.glob(item, recursive=True)
+        else:
+            matches = [item]
+
+        for path in matches:
+            # Skip PowerPoint lock files such as ~$deck.pptx
+            if os.path.basename(path).startswith("~$"):
+                continue
+            if path.lower().endswith(".pptx") or path == item:
+                found.append(os.path.normpath(path))
+
+    return sorted(dict.fromkeys(found))
+
+
+def output_paths_for(pptx_paths: List[str], output_dir: str) -> Dict[str, str]:
+    """Map each deck to a unique .docx path in output_dir"""
+    outputs = {}
+    used = set()
+    for path in pptx_paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name = f"{stem}.docx"
+        counter = 1
+        while name in used:
+            counter += 1
+            name = f"{stem}_{counter}.docx"
+        used.add(name)
+        outputs[path] = os.path.join(output_dir, name)
+    return outputs
+
+
+def _init_worker(config_path: Optional[str], threads_per_worker: Optional[int] = None):
+    """Pool initializer: build the worker's generator once"""
+    global _worker_generator
+    if threads_per_worker:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+
+    from storyboard_generator import StoryboardGenerator
+    _worker_generator = StoryboardGenerator(config_path)
+
+
+def fork_available() -> bool:
+    """Whether workers can be forked from a parent that already holds the models"""
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def _load_shared_generator(config_path: Optional[str]):
+    """
+    Build and warm the generator in the parent before forking workers
+
+    Forked workers inherit the loaded weights copy-on-write. Tensor storage is
+    never written during inference, so those pages stay shared between all
+    workers instead of being duplicated per process.
+    """
+    global _worker_generator
+    import torch
+
+    # Keep the parent single-threaded: an OpenMP pool created before fork is
+    # unusable in the children
+    torch.set_num_threads(1)
+
+    from storyboard_generator import StoryboardGenerator
+    _worker_generator = StoryboardGenerator(config_path)
+    _worker_generator.warm_up()
+
+    # Move everything allocated so far out of the collector's reach so that
+    # garbage collection in the workers doesn't touch (and copy) those pages
+    gc.collect()
+    gc.freeze()
+
+
+def _init_forked_worker(threads_per_worker: Optional[int] = None):
+    """Pool initializer for forked workers: adopt the parent's generator"""
+    if threads_per_worker:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    _worker_generator.reset_after_fork()
+
+
+def _process_deck(pptx_path: str, output_path: str, incremental: bool = False) -> Dict:
+    """Process one deck with the worker's generator and report the outcome"""
+    start = time.perf_counter()
+    result = {
+        "input": pptx_path,
+        "output": output_path,
+        "pid": os.getpid(),
+        "status": "ok",
+        "slides": 0,
+        "seconds": 0.0,
+        "error": None,
+        "image_stats": None
+    }
+
+    try:
+        _worker_generator.image_classifier.reset_stats()
+        manifest_path = f"{output_path}.manifest.json" if incremental else None
+        processed_content = _worker_generator.process_pptx(pptx_path, manifest_path)
+        _worker_generator.generate_storyboard(processed_content, output_path)
+        result["slides"] = len(processed_content)
+        result["image_stats"] = dict(_worker_generator.image_classifier.stats)
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(pptx_paths: List[str], output_dir: str, config_path: Optional[str] = None,
+              jobs: int = 1, incremental: bool = False, progress=print,
+              share_models: bool = True) -> List[Dict]:
+    """
+    Process decks, one worker process per job slot
+
+    Args:
+        pptx_paths: Decks to process
+        output_dir: Directory for the per-deck storyboard documents
+        config_path: Generator configuration file used by every worker
+        jobs: Number of worker processes; 1 processes decks in this process
+        incremental: Reuse per-deck manifests next to each output
+        progress: Callable receiving one status line per finished deck
+        share_models: Load models once in this process and fork workers that
+            share the weights (where fork is available); otherwise every
+            worker loads its own copy
+
+    Returns:
+        List of per-deck result dictionaries, in input order
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = output_paths_for(pptx_paths, output_dir)
+    jobs = max(1, min(jobs, len(pptx_paths) or 1))
+
+    # Split the cores between workers so they don't oversubscribe each other
+    threads_per_worker = max(1, (os.cpu_count() or 1) // jobs)
+
+    results = {}
+    if jobs == 1:
+        _init_worker(config_path)
+        for path in pptx_paths:
+            results[path] = _process_deck(path, outputs[path], incremental)
+            progress(_format_progress(results[path], len(results), len(pptx_paths)))
+        return [results[path] for path in pptx_paths]
+
+    if share_models and fork_available():
+        _load_shared_generator(config_path)
+        pool = ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_forked_worker,
+            initargs=(threads_per_worker,)
+        )
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(config_path, threads_per_worker)
+        )
+
+    with pool:
+        futures = {
+            pool.submit(_process_deck, path, outputs[path], incremental): path
+            for path in pptx_paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. out of memory)
+                results[path] = {
+                    "input": path,
+                    "output": outputs[path],
+                    "pid": None,
+                    "status": "failed",
+                    "slides": 0,
+                    "seconds": 0.0,
+                    "error": f"{type(e).__name__}: {e}"
+                }
+            progress(_format_progress(results[path], len(results), len(pptx_paths)))
+
+    if share_models and fork_available():
+        gc.unfreeze()
+
+    return [results[path] for path in pptx_paths]
+
+
+def _format_progress(result: Dict, done: int, total: int) -> str:
+    status = "ok" if result["status"] == "ok" else f"FAILED ({result['error']})"
+    return f"[{done}/{total}] {result['input']}: {status} in {result['seconds']:.1f}s"
+
+
+def summarize(results: List[Dict], wall_seconds: float) -> Dict:
+    """Aggregate timings and failures of a batch run"""
+    succeeded = [r for r in results if r["status"] == "ok"]
+    failed = [r for r in results if r["status"] != "ok"]
+    deck_seconds = [r["seconds"] for r in succeeded]
+    image_stats = {"cached": 0, "heuristic": 0, "model": 0, "failed": 0}
+    for r in succeeded:
+        for key, count in (r.get("image_stats") or {}).items():
+            image_stats[key] = image_stats.get(key, 0) + count
+    return {
+        "decks": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(failed),
+        "slides": sum(r["slides"] for r in succeeded),
+        "images": image_stats,
+        "wall_seconds": round(wall_seconds, 3),
+        "total_deck_seconds": round(sum(deck_seconds), 3),
+        "mean_deck_seconds": round(sum(deck_seconds) / len(deck_seconds), 3) if deck_seconds else 0.0,
+        "max_deck_seconds": max(deck_seconds) if deck_seconds else 0.0,
+        "decks_per_minute": round(len(results) / wall_seconds * 60, 2) if wall_seconds > 0 else 0.0,
+        "failures": [{"input": r["input"], "error": r["error"]} for r in failed]
+    }
+
+
+def format_image_stats(stats: Dict) -> str:
+    """One-line account of how images were classified"""
+    return (f"{stats['model']} through the CNN, {stats['heuristic']} short-circuited by heuristics, "
+            f"{stats['cached']} cached, {stats['failed']} failed")
+
+
+def format_summary(summary: Dict) -> str:
+    """Human-readable batch summary"""
+    lines = [
+        "Batch summary:",
+        f"  Decks:      {summary['decks']} ({summary['succeeded']} ok, {summary['failed']} failed)",
+        f"  Slides:     {summary['slides']}",
+        f"  Images:     {format_image_stats(summary['images'])}",
+        f"  Wall time:  {summary['wall_seconds']:.1f}s ({summary['decks_per_minute']} decks/min)",
+        f"  Per deck:   mean {summary['mean_deck_seconds']:.1f}s, max {summary['max_deck_seconds']:.1f}s"
+    ]
+    for failure in summary["failures"]:
+        lines.append(f"  FAILED {failure['input']}: {failure['error']}")
+    return "\n".join(lines)
+
+
+def write_report(path: str, results: List[Dict], summary: Dict):
+    """Write the per-deck results and summary as JSON"""
+    with open(path, 'w') as f:
+        json.dump({"summary": summary, "decks": results}, f, indent=2)
@@ -0,0 +1,168 @@
+"""
+Inference backend benchmark
+
+Compares the fp32, int8 and onnx CPU backends on a labelled sample. For each
+backend it reports load time, throughput, per-item latency, accuracy against
+the labels, agreement with the fp32 predictions and peak memory. Each backend
+runs in a fresh process, so the memory figures are not affected by the others
+(Linux only, reads /proc/self/status).
+
+Labelled sample:
+    --images DIR    one subdirectory per image category (chart/, icon/, logo/, ...)
+    --slides FILE   JSON list of {"text": ..., "label": ...} with slide categories
+
+Every backend classifies images with the same ResNet weights: the file given
+with --weights, or else a classification head initialized once (seeded) and
+saved to a temporary file for the run.
+
+Usage:
+    python benchmarks/bench_backends.py --images sample/images --slides sample/slides.json \
+        [--weights image_model.safetensors] [--backends fp32 int8 onnx] [--threads 4] [--onnx-dir /tmp/onnx]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def peak_rss_mb() -> float:
+    """High-water RSS of this process"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def load_image_sample(directory: str):
+    """(path, label) pairs from one subdirectory per category"""
+    sample = []
+    for label in sorted(os.listdir(directory)):
+        category_dir = os.path.join(directory, label)
+        if not os.path.isdir(category_dir):
+            continue
+        for name in sorted(os.listdir(category_dir)):
+            sample.append((os.path.join(category_dir, name), label))
+    return sample
+
+
+def load_slide_sample(path: str):
+    with open(path, 'r') as f:
+        return [(item["text"], item["label"]) for item in json.load(f)]
+
+
+def save_seeded_weights(path: str, seed: int = 0):
+    """Save ImageNet ResNet-50 with a seeded classification head; runs in a fresh process"""
+    import torch
+    torch.manual_seed(seed)
+    from models.image_classifier import HybridImageClassifier
+
+    classifier = HybridImageClassifier()
+    classifier.save_model(path)
+    classifier.close()
+
+
+def run_images(backend: str, sample, threads: int, onnx_dir, weights: str):
+    """Classify the image sample with one backend; runs in a fresh process"""
+    import torch
+    torch.set_num_threads(threads)
+    from models.image_classifier import HybridImageClassifier
+
+    # Every image goes through the network, so the heuristics don't mask differences
+    classifier = HybridImageClassifier(weights, heuristic_threshold=None, backend=backend, onnx_dir=onnx_dir)
+    start = time.perf_counter()
+    classifier.model
+    load_seconds = time.perf_counter() - start
+
+    # Warm-up pass so one-off allocations don't count towards latency
+    classifier.classify_images([path for path, _ in sample[:classifier.batch_size]])
+
+    start = time.perf_counter()
+    results = classifier.classify_images([path for path, _ in sample])
+    seconds = time.perf_counter() - start
+    return [r["predicted_type"] for r in results], load_seconds, seconds, peak_rss_mb()
+
+
+def run_slides(backend: str, sample, threads: int, onnx_dir, weights=None):
+    """Classify the slide sample with one backend; runs in a fresh process"""
+    import torch
+    torch.set_num_threads(threads)
+    from models.slide_classifier import SlideClassifier
+
+    classifier = SlideClassifier(backend=backend, onnx_dir=onnx_dir)
+    start = time.perf_counter()
+    classifier.model
+    load_seconds = time.perf_counter() - start
+
+    slides = [{"text": text} for text, _ in sample]
+    classifier.get_slide_types(slides[:classifier.batch_size])
+
+    start = time.perf_counter()
+    predictions = [slide_type for slide_type, _ in classifier.get_slide_types(slides, 0.0)]
+    seconds = time.perf_counter() - start
+    return predictions, load_seconds, seconds, peak_rss_mb()
+
+
+def report(kind: str, sample, runner, backends, threads: int, onnx_dir, weights=None):
+    labels = [label for _, label in sample]
+    reference = None
+
+    print(f"\n{kind}: {len(sample)} labelled items, {threads} thread(s)")
+    print(f"{'backend':<8} {'load s':>7} {'items/s':>8} {'ms/item':>8} {'accuracy':>9} {'vs fp32':>8} {'peak MiB':>9}")
+    for backend in backends:
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            predictions, load_seconds, seconds, peak = pool.apply(
+                runner, (backend, sample, threads, onnx_dir, weights)
+            )
+
+        accuracy = sum(p == l for p, l in zip(predictions, labels)) / len(sample)
+        if backend == "fp32":
+            reference = predictions
+        agreement = "-"
+        if reference is not None:
+            agreement = f"{sum(p == r for p, r in zip(predictions, reference)) / len(sample):.1%}"
+
+        print(f"{backend:<8} {load_seconds:>7.2f} {len(sample) / seconds:>8.1f} "
+              f"{seconds / len(sample) * 1000:>8.1f} {accuracy:>9.1%} {agreement:>8} {peak:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", help="Directory of labelled images (one subdirectory per category)")
+    parser.add_argument("--slides", help="JSON file of labelled slide texts")
+    parser.add_argument("--backends", nargs="+", default=["fp32", "int8", "onnx"])
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--onnx-dir", default=None, help="Where exported graphs are kept")
+    parser.add_argument("--weights", default=None,
+                        help="ResNet weights saved by save_model (default: a seeded head, shared by every backend)")
+    args = parser.parse_args()
+
+    if not args.images and not args.slides:
+        parser.error("give a labelled sample with --images and/or --slides")
+
+    # fp32 first, so the other backends can be compared with it
+    backends = sorted(args.backends, key=lambda b: b != "fp32")
+
+    if args.images:
+        with tempfile.TemporaryDirectory() as tmp:
+            weights = args.weights
+            if weights is None:
+                weights = os.path.join(tmp, "resnet50-seeded.safetensors")
+                with multiprocessing.get_context("spawn").Pool(1) as pool:
+                    pool.apply(save_seeded_weights, (weights,))
+            report("Images (ResNet-50)", load_image_sample(args.images), run_images,
+                   backends, args.threads, args.onnx_dir, weights)
+    if args.slides:
+        report("Slides (BGE-M3)", load_slide_sample(args.slides), run_slides,
+               backends, args.threads, args.onnx_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
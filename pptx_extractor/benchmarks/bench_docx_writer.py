@@ -0,0 +1,129 @@
+"""
+Storyboard document writer benchmark
+
+Writes storyboards for synthetic processed decks of increasing size with the
+bulk writer (tables cloned from prebuilt templates) and with the original
+cell-by-cell python-docx code, and reports the generation time of each.
+Also checks that both produce identical document XML.
+
+Usage:
+    python benchmarks/bench_docx_writer.py [--slides 50 200 500] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+
+from storyboard_generator import StoryboardGenerator, SLIDE_TABLE_HEADERS
+
+
+def build_content(slides: int):
+    """Processed content as returned by process_pptx, with a quiz every tenth slide"""
+    content = []
+    for n in range(1, slides + 1):
+        content.append({
+            "slide_number": n,
+            "source_text": f"Slide {n}",
+            "text": f"Slide {n}: Phase III trial results\nThe <mark>RCT</mark> met its primary endpoint.\tp<0.05",
+            "notes": f"Speaker notes for slide {n}",
+            "slide_type": ("quiz" if n % 10 == 0 else "content", 0.9),
+            "images": [
+                {"semantic_type": {"predicted_type": "chart"}, "dimensions": "640x480"},
+                {"semantic_type": {"predicted_type": "logo"}, "dimensions": "128x128"}
+            ],
+            "abbreviations": {"RCT": "Randomized Controlled Trial", f"AB{n % 50}": f"Abbreviation {n % 50}"},
+            "validation_results": {}
+        })
+    return content
+
+
+def write_cell_by_cell(generator: StoryboardGenerator, content, output_path: str):
+    """The original writer: every table and cell goes through the python-docx API"""
+    doc = Document()
+
+    table = doc.add_table(rows=1, cols=2)
+    table.style = 'Table Grid'
+    table.rows[0].cells[0].text = "Chapter"
+    table.rows[0].cells[1].text = "Subchapter"
+
+    used = {}
+    for slide in content:
+        used.update(slide["abbreviations"])
+    abbrev_list = generator.abbreviation_handler.create_abbreviations_table(used)
+    if abbrev_list:
+        table = doc.add_table(rows=1, cols=2)
+        table.style = 'Table Grid'
+        table.rows[0].cells[0].text = "Abbreviation"
+        table.rows[0].cells[1].text = "Definition"
+        for abbrev in abbrev_list:
+            row = table.add_row()
+            row.cells[0].text = abbrev["abbreviation"]
+            row.cells[1].text = abbrev["definition"]
+
+    for slide in content:
+        table = doc.add_table(rows=8, cols=2)
+        table.style = 'Table Grid'
+        contents = ["", "", slide["text"], generator._format_image_info(slide["images"]),
+                    generator._format_visual_details(slide), "", "", ""]
+        for idx, (header, text) in enumerate(zip(SLIDE_TABLE_HEADERS, contents)):
+            table.rows[idx].cells[0].text = header
+            table.rows[idx].cells[1].text = text
+
+    for slide in content:
+        if slide["slide_type"][0] == "quiz":
+            table = doc.add_table(rows=1, cols=2)
+            table.style = 'Table Grid'
+
+    doc.save(output_path)
+
+
+def document_xml(path: str) -> bytes:
+    with zipfile.ZipFile(path) as package:
+        return package.read("word/document.xml")
+
+
+def best_of(repeat: int, write) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        write()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--slides", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    generator = StoryboardGenerator()
+
+    print(f"{'slides':>6} {'cell-by-cell s':>15} {'bulk s':>8} {'speedup':>8} {'identical':>10}")
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for slides in args.slides:
+            content = build_content(slides)
+            reference_path = os.path.join(tmp, f"reference_{slides}.docx")
+            bulk_path = os.path.join(tmp, f"bulk_{slides}.docx")
+
+            reference = best_of(args.repeat, lambda: write_cell_by_cell(generator, content, reference_path))
+            bulk = best_of(args.repeat, lambda: generator.generate_storyboard(content, bulk_path))
+
+            identical = document_xml(reference_path) == document_xml(bulk_path)
+            mismatches += not identical
+            print(f"{slides:>6} {reference:>15.2f} {bulk:>8.2f} {reference / bulk:>7.1f}x {str(identical):>10}")
+
+    generator.close()
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    exit(main())
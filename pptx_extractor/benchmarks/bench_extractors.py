@@ -0,0 +1,136 @@
+"""
+Extraction engine benchmark
+
+Builds synthetic decks (text boxes, group shapes, tables, speaker notes and
+images, some of them repeated across slides) and compares the python-pptx
+engine with the OPC/iterparse engine on wall time and peak memory. Each run
+happens in a fresh process so peak RSS includes lxml's native allocations
+(Linux only, reads /proc/self/status).
+Also checks that both engines return the same records.
+
+Usage:
+    python benchmarks/bench_extractors.py [--slides 100 500] [--image-size 384]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+
+from pptx_extractor import create_extractor
+
+
+def _png(seed: int, size: int) -> bytes:
+    """Noise image, so the PNG stays roughly as large as a photo of that size"""
+    rng = random.Random(seed)
+    img = Image.frombytes("RGB", (size, size), rng.randbytes(size * size * 3))
+    buffer = BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def build_deck(path: str, slides: int, image_size: int):
+    """Write a synthetic deck with a shared logo and one unique image per slide"""
+    prs = Presentation()
+    layout = prs.slide_layouts[5]
+    logo = _png(0, 128)
+
+    for n in range(1, slides + 1):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {n}: Phase III trial results"
+
+        body = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(4), Inches(2)).text_frame
+        body.text = "The randomized controlled trial (RCT) met its primary endpoint."
+        body.add_paragraph().text = f"Patients enrolled: {n * 17}"
+
+        group = slide.shapes.add_group_shape()
+        group.shapes.add_textbox(Inches(5), Inches(1.5), Inches(3), Inches(1)).text_frame.text = "Grouped caption"
+
+        table = slide.shapes.add_table(3, 3, Inches(0.5), Inches(4), Inches(5), Inches(1.5)).table
+        for r in range(3):
+            for c in range(3):
+                table.cell(r, c).text = f"R{r}C{c}"
+
+        slide.shapes.add_picture(BytesIO(logo), Inches(8.5), Inches(0.2), Inches(1), Inches(1))
+        slide.shapes.add_picture(BytesIO(_png(n, image_size)), Inches(5.5), Inches(3), Inches(3), Inches(3))
+
+        slide.notes_slide.notes_text_frame.text = f"Speaker notes for slide {n}"
+
+    prs.save(path)
+
+
+def peak_rss_mb() -> float:
+    """High-water RSS of this process (VmHWM, which unlike ru_maxrss is reset by exec)"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_engine(engine: str, path: str, output_dir: str):
+    """Extract every record in this process; returns records, seconds and peak RSS in MiB"""
+    start = time.perf_counter()
+
+    with create_extractor(path, engine) as extractor:
+        records = list(extractor.iter_slides(output_dir))
+
+    seconds = time.perf_counter() - start
+    return [comparable(r) for r in records], seconds, peak_rss_mb()
+
+
+def comparable(record: dict) -> dict:
+    """Record fields that must agree between engines (fingerprints may differ)"""
+    return {
+        "slide_number": record["slide_number"],
+        "text": record["text"],
+        "tables": record["tables"],
+        "notes": record["notes"],
+        "images": [
+            {k: v for k, v in image.items() if k != "path"}
+            for image in record["images"]
+        ]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--slides", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--image-size", type=int, default=384)
+    args = parser.parse_args()
+
+    print(f"{'slides':>6} {'engine':<12} {'seconds':>8} {'peak RSS MiB':>13}")
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for slides in args.slides:
+            deck = os.path.join(tmp, f"deck_{slides}.pptx")
+            build_deck(deck, slides, args.image_size)
+
+            results = {}
+            for engine in ("python-pptx", "opc"):
+                with multiprocessing.get_context("spawn").Pool(1) as pool:
+                    records, seconds, peak = pool.apply(
+                        run_engine, (engine, deck, os.path.join(tmp, engine))
+                    )
+                results[engine] = records
+                print(f"{slides:>6} {engine:<12} {seconds:>8.2f} {peak:>13.1f}")
+
+            if results["python-pptx"] != results["opc"]:
+                mismatches += 1
+                print(f"{slides:>6} records differ between engines")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    exit(main())
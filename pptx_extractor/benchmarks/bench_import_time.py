@@ -0,0 +1,83 @@
+"""
+Import-time benchmark
+
+Guards CLI startup: importing storyboard_generator and running `main.py --help`
+must not pull in the heavy ML/document libraries and must stay under a time
+budget. Exits non-zero when either check fails, so it can run in CI.
+
+Usage:
+    python benchmarks/bench_import_time.py [--budget 1.0] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported when a stage actually needs them
+HEAVY_MODULES = ["torch", "torchvision", "sentence_transformers", "transformers", "spacy", "docx"]
+
+CHECKS = {
+    "import storyboard_generator": [
+        "-c",
+        "import sys, json, storyboard_generator; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    ],
+    "main.py --help": ["main.py", "--help"],
+    "construct StoryboardGenerator": [
+        "-c",
+        "import sys, json; from storyboard_generator import StoryboardGenerator; "
+        "StoryboardGenerator(); "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    ]
+}
+
+
+def time_command(args, runs: int):
+    """Best-of-N wall time of a fresh interpreter running args, plus its last stdout line"""
+    best = float("inf")
+    output = ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable] + args, cwd=PACKAGE_DIR,
+            capture_output=True, text=True
+        )
+        best = min(best, time.perf_counter() - start)
+        if completed.returncode != 0:
+            raise RuntimeError(f"{' '.join(args)} failed:\n{completed.stderr}")
+        lines = completed.stdout.strip().splitlines()
+        output = lines[-1] if lines else ""
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=float, default=1.0, help="Maximum seconds per check")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for name, command in CHECKS.items():
+        seconds, output = time_command(command, args.runs)
+        heavy = json.loads(output) if output.startswith("[") else []
+
+        problems = []
+        if seconds > args.budget:
+            problems.append(f"over budget ({args.budget:.2f}s)")
+        if heavy:
+            problems.append(f"imported {', '.join(heavy)}")
+        failed = failed or bool(problems)
+
+        status = "FAIL: " + "; ".join(problems) if problems else "ok"
+        print(f"{name:<32} {seconds:6.3f}s  {status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
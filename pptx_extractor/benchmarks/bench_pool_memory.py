@@ -0,0 +1,123 @@
+"""
+Worker pool memory benchmark
+
+Compares the total memory of N batch workers that share models loaded once in
+the parent (fork-after-load) against N workers that each load their own copy.
+
+Memory is reported as PSS (proportional set size), which splits shared pages
+between the processes that map them, so the per-mode totals are directly
+comparable. Linux only (reads /proc/<pid>/smaps_rollup).
+
+Usage:
+    python benchmarks/bench_pool_memory.py --workers 4 [--config config.json]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_runner
+
+
+def read_memory(pid: int = None) -> dict:
+    """RSS, PSS and private memory of a process in MiB"""
+    pid = pid or os.getpid()
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0)
+    }
+
+
+def _worker_probe(_):
+    """Touch the models like a real job would, then report this worker's memory"""
+    generator = batch_runner._worker_generator
+    generator.warm_up()
+    time.sleep(0.5)  # keep the worker alive so every probe lands on a distinct process
+    return os.getpid()
+
+
+def measure(mode: str, workers: int, config_path: str) -> dict:
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    start = time.perf_counter()
+
+    if mode == "shared":
+        batch_runner._load_shared_generator(config_path)
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=batch_runner._init_forked_worker,
+            initargs=(threads,)
+        )
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=batch_runner._init_worker,
+            initargs=(config_path, threads)
+        )
+
+    with pool:
+        pids = set(pool.map(_worker_probe, range(workers)))
+        ready_seconds = time.perf_counter() - start
+        worker_memory = [read_memory(pid) for pid in pids]
+
+    parent_memory = read_memory()
+    total_pss = sum(m["pss"] for m in worker_memory)
+    if mode == "shared":
+        # The parent holds the shared copy; count it too
+        total_pss += parent_memory["pss"]
+
+    return {
+        "mode": mode,
+        "workers": len(pids),
+        "ready_seconds": ready_seconds,
+        "total_pss_mb": total_pss,
+        "mean_worker_private_mb": sum(m["private"] for m in worker_memory) / len(worker_memory),
+        "mean_worker_rss_mb": sum(m["rss"] for m in worker_memory) / len(worker_memory)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--config", default=None)
+    args = parser.parse_args()
+
+    if not batch_runner.fork_available():
+        print("fork is not available on this platform; nothing to compare")
+        return 1
+
+    # Independent loads first, so the parent is still small while they run
+    results = [
+        measure("independent", args.workers, args.config),
+        measure("shared", args.workers, args.config)
+    ]
+
+    print(f"{'mode':<12} {'workers':>7} {'ready (s)':>10} {'total PSS (MiB)':>16} "
+          f"{'private/worker':>15} {'RSS/worker':>11}")
+    for r in results:
+        print(f"{r['mode']:<12} {r['workers']:>7} {r['ready_seconds']:>10.1f} "
+              f"{r['total_pss_mb']:>16.0f} {r['mean_worker_private_mb']:>15.0f} "
+              f"{r['mean_worker_rss_mb']:>11.0f}")
+
+    independent, shared = results
+    if shared["total_pss_mb"]:
+        print(f"\nShared models use {independent['total_pss_mb'] / shared['total_pss_mb']:.1f}x "
+              f"less memory for {args.workers} workers")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,93 +1,268 @@
-"""
-CLI interface for the PowerPoint Storyboard Generator
-"""
-
-import argparse
-import os
-import json
-from storyboard_generator import StoryboardGenerator
-
-def main():
-    parser = argparse.ArgumentParser(
-        description="Convert PowerPoint presentations to structured storyboard documents"
-    )
-    
-    parser.add_argument(
-        "pptx_path",
-        help="Path to the input PowerPoint file"
-    )
-    
-    parser.add_argument(
-        "--config",
-        help="Path to configuration file",
-        default=None
-    )
-    
-    parser.add_argument(
-        "--output",
-        help="Path for output storyboard document",
-        default="storyboard.docx"
-    )
-    
-    parser.add_argument(
-        "--template",
-        help="Path to template document",
-        default=None
-    )
-    
-    parser.add_argument(
-        "--instructions",
-        help="Path to instructions document",
-        default=None
-    )
-    
-    parser.add_argument(
-        "--training-pairs",
-        help="Path to directory containing training pairs",
-        default=None
-    )
-    
-    args = parser.parse_args()
-    
-    # Create configuration if not provided
-    if not args.config:
-        config = {
-            "template_path": args.template,
-            "instruction_path": args.instructions,
-            "output_path": os.path.dirname(args.output),
-            "training_pairs_path": args.training_pairs
-        }
-        
-        config_path = "config.json"
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=2)
-    else:
-        config_path = args.config
-    
-    try:
-        # Initialize generator
-        generator = StoryboardGenerator(config_path)
-        
-        # Load training data if available
-        if args.training_pairs:
-            print("Loading training data...")
-            generator.load_training_data()
-        
-        # Process PowerPoint file
-        print(f"Processing {args.pptx_path}...")
-        processed_content = generator.process_pptx(args.pptx_path)
-        
-        # Generate storyboard
-        print(f"Generating storyboard at {args.output}...")
-        generator.generate_storyboard(processed_content, args.output)
-        
-        print("Storyboard generation completed successfully!")
-        
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return 1
-    
-    return 0
-
-if __name__ == "__main__":
+"""
+CLI interface for the PowerPoint Storyboard Generator
+"""
+
+import argparse
+import os
+import json
+import time
+from batch_runner import (
+    expand_inputs, output_paths_for, run_batch, summarize, format_summary, format_image_stats, write_report
+)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert PowerPoint presentations to structured storyboard documents"
+    )
+    
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="PowerPoint files, directories or glob patterns to process"
+    )
+    
+    parser.add_argument(
+        "--config",
+        help="Path to configuration file",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--output",
+        help="Path for output storyboard document (single deck)",
+        default="storyboard.docx"
+    )
+    
+    parser.add_argument(
+        "--output-dir",
+        help="Directory for per-deck storyboard documents (batch mode)",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--jobs", "-j",
+        help="Number of worker processes for batch mode",
+        type=int,
+        default=1
+    )
+    
+    parser.add_argument(
+        "--no-shared-models",
+        help="Load models separately in every worker instead of sharing them copy-on-write",
+        action="store_true"
+    )
+    
+    parser.add_argument(
+        "--report",
+        help="Path for a JSON report of per-deck timings and failures (batch mode)",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--server",
+        help="Submit jobs to a running storyboard server (e.g. http://127.0.0.1:8765) instead of processing locally",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--template",
+        help="Path to template document",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--instructions",
+        help="Path to instructions document",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--training-pairs",
+        help="Path to directory containing training pairs",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--incremental",
+        help="Reuse results for unchanged slides from the manifest next to the output",
+        action="store_true"
+    )
+    
+    parser.add_argument(
+        "--engine",
+        help="Extraction engine: python-pptx (object model) or opc (streaming zip/XML, lighter on large decks)",
+        choices=["python-pptx", "opc"],
+        default="python-pptx"
+    )
+    
+    parser.add_argument(
+        "--backend",
+        help="CPU inference backend for the image and embedding models: fp32, int8 (dynamic quantization) or onnx (ONNX Runtime)",
+        choices=["fp32", "int8", "onnx"],
+        default="fp32"
+    )
+    
+    parser.add_argument(
+        "--model-bundle",
+        help="Offline model bundle directory (see python -m models.model_bundle)",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--export-images",
+        help="Directory to export the deck's images to (by default images are processed in memory)",
+        default=None
+    )
+    
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory for the persistent embedding/classification cache",
+        default=None
+    )
+    
+    args = parser.parse_args()
+    
+    # Thin client: the server already has the models loaded
+    if args.server:
+        return run_client_mode(args)
+    
+    # Create configuration if not provided
+    if not args.config:
+        config = {
+            "template_path": args.template,
+            "instruction_path": args.instructions,
+            "output_path": os.path.dirname(args.output),
+            "training_pairs_path": args.training_pairs,
+            "cache_dir": args.cache_dir,
+            "extraction_engine": args.engine,
+            "embedding_backend": args.backend,
+            "image_backend": args.backend,
+            "model_bundle": args.model_bundle,
+            "image_export_dir": args.export_images
+        }
+        
+        config_path = "config.json"
+        with open(config_path, 'w') as f:
+            json.dump(config, f, indent=2)
+    else:
+        config_path = args.config
+    
+    pptx_paths = expand_inputs(args.inputs)
+    if not pptx_paths:
+        print("Error: no PowerPoint files found")
+        return 1
+    
+    # Directories, globs, several decks or --output-dir select batch mode
+    if len(pptx_paths) > 1 or args.output_dir or any(os.path.isdir(i) for i in args.inputs):
+        return run_batch_mode(args, pptx_paths, config_path)
+    
+    args.pptx_path = pptx_paths[0]
+    
+    try:
+        from storyboard_generator import StoryboardGenerator
+        
+        # Initialize generator
+        generator = StoryboardGenerator(config_path)
+        
+        # Load training data if available
+        if args.training_pairs:
+            print("Loading training data...")
+            generator.load_training_data()
+        
+        # Process PowerPoint file
+        print(f"Processing {args.pptx_path}...")
+        manifest_path = f"{args.output}.manifest.json" if args.incremental else None
+        processed_content = generator.process_pptx(args.pptx_path, manifest_path)
+        print(f"Images: {format_image_stats(generator.image_classifier.stats)}")
+        
+        # Generate storyboard
+        print(f"Generating storyboard at {args.output}...")
+        generator.generate_storyboard(processed_content, args.output)
+        
+        print("Storyboard generation completed successfully!")
+        
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return 1
+    
+    return 0
+
+def run_batch_mode(args, pptx_paths, config_path):
+    """Process many decks with a pool of workers and print a summary report"""
+    output_dir = args.output_dir or "output"
+    print(f"Processing {len(pptx_paths)} decks with {args.jobs} worker(s) into {output_dir}...")
+    
+    start = time.perf_counter()
+    results = run_batch(
+        pptx_paths,
+        output_dir,
+        config_path=config_path,
+        jobs=args.jobs,
+        incremental=args.incremental,
+        share_models=not args.no_shared_models
+    )
+    summary = summarize(results, time.perf_counter() - start)
+    
+    print(format_summary(summary))
+    if args.report:
+        write_report(args.report, results, summary)
+        print(f"Report written to {args.report}")
+    
+    return 1 if summary["failed"] else 0
+
+def run_client_mode(args):
+    """Submit decks to a running server and wait for the results"""
+    from server import submit_job, wait_for_job
+    
+    pptx_paths = expand_inputs(args.inputs)
+    if not pptx_paths:
+        print("Error: no PowerPoint files found")
+        return 1
+    
+    if len(pptx_paths) == 1 and not args.output_dir:
+        outputs = {pptx_paths[0]: args.output}
+    else:
+        outputs = output_paths_for(pptx_paths, args.output_dir or "output")
+    
+    start = time.perf_counter()
+    jobs = {}
+    try:
+        for path in pptx_paths:
+            # Back off while the server's queue is full
+            while True:
+                try:
+                    jobs[path] = submit_job(args.server, path, outputs[path], args.incremental)
+                    break
+                except RuntimeError as e:
+                    if "503" not in str(e):
+                        raise
+                    time.sleep(1.0)
+            print(f"Submitted {path} (job {jobs[path]['id']})")
+        
+        results = []
+        for path in pptx_paths:
+            job = wait_for_job(args.server, jobs[path]["id"])
+            results.append({
+                "input": path,
+                "output": outputs[path],
+                "status": "ok" if job["status"] == "done" else "failed",
+                "slides": job["slides"] or 0,
+                "seconds": round(job["finished"] - job["started"], 3) if job["started"] else 0.0,
+                "error": job["error"],
+                "image_stats": job.get("image_stats")
+            })
+            print(f"{path}: {job['status']}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return 1
+    
+    summary = summarize(results, time.perf_counter() - start)
+    if len(results) > 1:
+        print(format_summary(summary))
+    if args.report:
+        write_report(args.report, results, summary)
+    
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
     exit(main()) 
\ No newline at end of file
@@ -1,98 +1,474 @@
-"""
-Hybrid Image Classifier for PowerPoint content
-Combines pre-trained models with custom training capabilities
-"""
-
-import torch
-import torch.nn as nn
-from torchvision import models, transforms
-from PIL import Image
-import numpy as np
-from typing import Dict, List, Tuple, Optional
-import os
-import json
-
-class HybridImageClassifier:
-    def __init__(self, custom_model_path: Optional[str] = None):
-        self.categories = [
-            'chart', 'graph', 'clinical_image', 'icon', 'shape',
-            'algorithm', 'stock_photo', 'logo', 'general_image'
-        ]
-        
-        # Load pre-trained ResNet model
-        self.model = models.resnet50(pretrained=True)
-        num_ftrs = self.model.fc.in_features
-        self.model.fc = nn.Linear(num_ftrs, len(self.categories))
-        
-        # Load custom weights if available
-        if custom_model_path and os.path.exists(custom_model_path):
-            self.model.load_state_dict(torch.load(custom_model_path))
-        
-        self.model.eval()
-        
-        self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-        ])
-
-    def classify_image(self, image_path: str) -> Dict[str, float]:
-        """
-        Classify an image and return confidence scores for each category
-        """
-        try:
-            image = Image.open(image_path).convert('RGB')
-            image_tensor = self.transform(image).unsqueeze(0)
-            
-            with torch.no_grad():
-                outputs = self.model(image_tensor)
-                probabilities = torch.nn.functional.softmax(outputs[0], dim=0)
-            
-            # Convert to dictionary of category: probability
-            results = {
-                category: float(prob)
-                for category, prob in zip(self.categories, probabilities)
-            }
-            
-            return results
-            
-        except Exception as e:
-            print(f"Error classifying image {image_path}: {str(e)}")
-            return {category: 0.0 for category in self.categories}
-
-    def train_on_examples(self, training_data: List[Tuple[str, str]], epochs: int = 10):
-        """
-        Train the model on custom examples
-        
-        Args:
-            training_data: List of tuples (image_path, category)
-            epochs: Number of training epochs
-        """
-        # Implementation for fine-tuning the model on custom examples
-        pass  # TODO: Implement training logic
-
-    def get_image_metadata(self, image_path: str) -> Dict[str, any]:
-        """
-        Extract comprehensive image metadata including classification
-        """
-        classification = self.classify_image(image_path)
-        
-        # Get additional metadata
-        with Image.open(image_path) as img:
-            metadata = {
-                "dimensions": img.size,
-                "format": img.format,
-                "mode": img.mode,
-                "classification": classification,
-                "predicted_type": max(classification.items(), key=lambda x: x[1])[0]
-            }
-        
-        return metadata
-
-    def save_model(self, path: str):
-        """Save the model weights"""
-        torch.save(self.model.state_dict(), path)
-
-    def load_model(self, path: str):
-        """Load model weights"""
-        self.model.load_state_dict(torch.load(path)) 
\ No newline at end of file
+"""
+Hybrid Image Classifier for PowerPoint content
+Combines pre-trained models with custom training capabilities
+"""
+
+from PIL import Image
+import numpy as np
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional, Union
+import os
+import tempfile
+import uuid
+import json
+from io import BytesIO
+
+from models.inference_backends import (
+    OnnxImageModel, check_backend, export_image_model, image_model_path, quantize_int8
+)
+from models.model_bundle import bundled_path, load_safetensors, save_safetensors
+from models.model_registry import shared_image_model
+from utils.result_cache import ResultCache, content_hash
+
+if TYPE_CHECKING:
+    import torch
+
+# An image given either as a file path or as its encoded bytes
+ImageSource = Union[str, bytes, bytearray, memoryview]
+
+# torch and torchvision are imported on first use so that importing this module
+# (and processing decks without images) stays fast
+
+# Identity of the randomly initialized head: one per process, so classifiers in
+# the same process share it (and the model), and forked workers inherit it
+_UNTRAINED_HEAD_ID = uuid.uuid4().hex
+
+class HybridImageClassifier:
+    def __init__(self, custom_model_path: Optional[str] = None, batch_size: int = 16,
+                 cache: Optional[ResultCache] = None, heuristic_threshold: Optional[float] = 0.9,
+                 backend: str = "fp32", onnx_dir: Optional[str] = None):
+        self.categories = [
+            'chart', 'graph', 'clinical_image', 'icon', 'shape',
+            'algorithm', 'stock_photo', 'logo', 'general_image'
+        ]
+        
+        # The ResNet model is built on first use, for the selected inference backend
+        self.backend = check_backend(backend)
+        self.onnx_dir = onnx_dir
+        self._model_handle = None
+        # Memory-map weights files (None: safetensors yes, torch checkpoints no)
+        self._mmap_weights = None
+        self._transform = None
+        self.custom_model_path = None
+        if custom_model_path and os.path.exists(custom_model_path):
+            self.custom_model_path = custom_model_path
+        else:
+            # Without custom weights, use the active model bundle's (if any)
+            self.custom_model_path = bundled_path("resnet", "resnet50")
+        self.weights_id = self._weights_id(self.custom_model_path)
+        self._acquire_model()
+        
+        # Number of images per inference batch
+        self.batch_size = batch_size
+        
+        # Side length the network sees; larger images are decoded at a reduced
+        # resolution that is still at least this size
+        self.input_size = 224
+        
+        # Images the size/colour heuristics label with at least this confidence
+        # skip the CNN; None sends every image to the CNN
+        self.heuristic_threshold = heuristic_threshold
+        
+        # How images were classified since the last reset_stats()
+        self.stats = {}
+        self.reset_stats()
+        
+        # Optional persistent classification cache, keyed by image hash and weights
+        self.cache = cache
+
+    @property
+    def has_trained_weights(self) -> bool:
+        """Whether the classification head comes from a weights file rather than a random init"""
+        return self.custom_model_path is not None
+
+    @property
+    def model_id(self) -> str:
+        """Identifier of weights, backend and heuristic settings"""
+        model_id = self.weights_id if self.backend == "fp32" else f"{self.weights_id}:{self.backend}"
+        if self.heuristic_threshold is None:
+            return model_id
+        return f"{model_id}+heuristic@2:{self.heuristic_threshold}"
+
+    @property
+    def cache_model_id(self) -> Optional[str]:
+        """
+        Identifier used to key cached results; None without trained weights,
+        since a randomly initialized head differs from one process to the next
+        """
+        return self.model_id if self.has_trained_weights else None
+
+    def reset_stats(self):
+        self.stats = {"cached": 0, "heuristic": 0, "model": 0, "failed": 0}
+
+    def _acquire_model(self):
+        """
+        Switch to the shared model for the current weights and backend; the
+        network is built on first use, once per process for all classifiers
+        """
+        if self._model_handle is not None:
+            self._model_handle.release()
+        self._model_handle = shared_image_model(self.weights_id, self.backend, self.onnx_dir, self._build_model)
+
+    @property
+    def model(self):
+        return self._model_handle.get()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model_handle.is_loaded
+
+    def close(self):
+        """Release the shared model"""
+        self._model_handle.release()
+
+    def _build_model(self):
+        """Load the pre-trained ResNet model with our classification head"""
+        import torch
+        import torch.nn as nn
+        from torchvision import models
+        
+        # Custom weights are complete: the network is not initialized from ImageNet first
+        if self.custom_model_path and self.custom_model_path.endswith(".safetensors"):
+            # Adopt the memory-mapped tensors as the parameters
+            state_dict = load_safetensors(self.custom_model_path, mmap_weights=self._mmap_weights is not False)
+            return self._for_backend(self._model_from_state_dict(state_dict))
+        if self.custom_model_path:
+            if self._mmap_weights:
+                state_dict = torch.load(self.custom_model_path, mmap=True)
+            else:
+                state_dict = torch.load(self.custom_model_path)
+            return self._for_backend(self._model_from_state_dict(state_dict))
+        
+        model = models.resnet50(pretrained=True)
+        num_ftrs = model.fc.in_features
+        model.fc = nn.Linear(num_ftrs, len(self.categories))
+        model.eval()
+        return self._for_backend(model)
+
+    def _model_from_state_dict(self, state_dict: Dict):
+        """
+        ResNet built without initializing (or downloading) any weights, whose
+        parameters are the tensors of state_dict
+        """
+        import torch
+        import torch.nn as nn
+        from torchvision import models
+        
+        with torch.device("meta"):
+            model = models.resnet50()
+            model.fc = nn.Linear(model.fc.in_features, len(self.categories))
+        model.load_state_dict(state_dict, assign=True)
+        model.eval()
+        return model
+
+    def _for_backend(self, model):
+        """Convert a full-precision model to the selected inference backend"""
+        if self.backend == "int8":
+            return quantize_int8(model)
+        if self.backend == "onnx":
+            if not self.has_trained_weights:
+                # A random head is never cached for other processes to reuse as
+                # if it were trained; the export only lives until it is loaded
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = os.path.join(tmp, "resnet50-untrained.onnx")
+                    export_image_model(model, path, self.input_size)
+                    return OnnxImageModel(path)
+            path = image_model_path(self.onnx_dir, self.weights_id)
+            if not os.path.exists(path):
+                export_image_model(model, path, self.input_size)
+            return OnnxImageModel(path)
+        return model
+
+    @property
+    def transform(self):
+        if self._transform is None:
+            from torchvision import transforms
+            self._transform = transforms.Compose([
+                transforms.Resize((self.input_size, self.input_size)),
+                transforms.ToTensor(),
+                transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+            ])
+        return self._transform
+
+    def _weights_id(self, weights_path: Optional[str]) -> str:
+        """Identifier of the current weights"""
+        if not weights_path:
+            # The head is initialized randomly, once per process
+            return f"resnet50-imagenet:{len(self.categories)}-untrained-{_UNTRAINED_HEAD_ID}@2"
+        stat = os.stat(weights_path)
+        return f"resnet50-{os.path.basename(weights_path)}:{stat.st_size}:{stat.st_mtime_ns}@2"
+
+    def _empty_scores(self) -> Dict[str, float]:
+        return {category: 0.0 for category in self.categories}
+
+    def _decode_image(self, image_name: str, image_bytes: bytes) -> Tuple[Dict[str, any], Optional["torch.Tensor"]]:
+        """
+        Decode an image once and return its metadata and preprocessed tensor
+        
+        Images the heuristics classify confidently come back with their
+        classification already in the metadata and no tensor.
+        """
+        try:
+            with Image.open(BytesIO(image_bytes)) as img:
+                # Metadata reports the original image, before any reduction
+                metadata = {
+                    "dimensions": img.size,
+                    "format": img.format,
+                    "mode": img.mode
+                }
+                reduced = self._reduced(img)
+                
+                if self.heuristic_threshold is not None:
+                    label, confidence = self._heuristic_label(reduced, metadata["dimensions"])
+                    if label and confidence >= self.heuristic_threshold:
+                        classification = self._label_scores(label, confidence)
+                        metadata["classification"] = classification
+                        metadata["predicted_type"] = label
+                        return metadata, None
+                
+                tensor = self.transform(reduced.convert('RGB'))
+            return metadata, tensor
+        except Exception as e:
+            print(f"Error classifying image {image_name}: {str(e)}")
+            return None, None
+
+    def _reduced(self, img: Image.Image) -> Image.Image:
+        """
+        Decode an image at the smallest resolution that still covers input_size
+        
+        JPEGs are scaled down by the decoder itself (draft mode decodes at 1/2,
+        1/4 or 1/8 scale); other formats are box-downsampled by an integer factor
+        right after decoding, so the resize to the network input starts small.
+        """
+        target = (self.input_size, self.input_size)
+        if img.format == "JPEG":
+            img.draft("RGB", target)
+        
+        factor = min(img.size[0] // self.input_size, img.size[1] // self.input_size)
+        if factor >= 2:
+            if img.mode not in ("L", "LA", "RGB", "RGBA", "I", "F"):
+                img = img.convert("RGBA" if "transparency" in img.info or "A" in img.mode else "RGB")
+            img = img.reduce(factor)
+        return img
+
+    def _heuristic_label(self, img: Image.Image, size: Tuple[int, int]) -> Tuple[Optional[str], float]:
+        """
+        Label trivial images from size, aspect ratio, colour count and alpha
+        
+        Args:
+            img: Decoded (possibly reduced) image
+            size: Original image size
+            
+        Returns:
+            Tuple of (category, confidence), or (None, 0.0) when the image should
+            go to the CNN
+        """
+        width, height = size
+        longest, shortest = max(width, height), max(1, min(width, height))
+        aspect = longest / shortest
+        
+        # Nearest-neighbour sampling keeps the palette of flat artwork intact
+        sample = img.convert("RGBA")
+        scale = min(1.0, 64 / max(sample.size))
+        sample = sample.resize(
+            (max(1, round(sample.width * scale)), max(1, round(sample.height * scale))),
+            Image.NEAREST
+        )
+        transparent = sample.getchannel("A").histogram()[0] / (sample.width * sample.height)
+        colours = sample.getcolors(maxcolors=256)
+        flat = colours is not None
+        if flat:
+            visible = [count for count, rgba in colours if rgba[3] > 0]
+            colour_count = len(visible)
+            # Share of the visible pixels taken by the most common colour
+            dominant = max(visible) / sum(visible) if visible else 0.0
+        
+        if aspect >= 8 and flat and colour_count <= 8:
+            # Rules, dividers and bars
+            return "shape", 0.95
+        if longest <= 64:
+            return "icon", 0.95
+        if longest <= 128 and aspect <= 1.5 and ((flat and colour_count <= 64) or transparent >= 0.1):
+            return "icon", 0.92
+        if flat and colour_count <= 4 and dominant >= 0.95 and transparent < 0.2 and longest <= 600:
+            # Near-uniform fills; simple charts and diagrams on a plain background
+            # have few colours too, but far less of the dominant one
+            return "shape", 0.92
+        if transparent >= 0.2 and flat and colour_count <= 32 and longest <= 320:
+            # Small artwork on a transparent canvas; larger ones are often diagrams
+            return "logo", 0.9
+        if 2 <= aspect <= 6 and flat and colour_count <= 16 and shortest <= 200:
+            # Wordmarks: wide, short and few colours, but easily confused with banners
+            return "logo", 0.85
+        return None, 0.0
+
+    def _label_scores(self, label: str, confidence: float) -> Dict[str, float]:
+        """Scores with confidence on label and the rest spread over the other categories"""
+        rest = (1.0 - confidence) / (len(self.categories) - 1)
+        return {
+            category: confidence if category == label else rest
+            for category in self.categories
+        }
+
+    def _classify_batch(self, tensors: List["torch.Tensor"]) -> List[Dict[str, float]]:
+        """Run one forward pass over a batch of preprocessed images"""
+        import torch
+        
+        model = self.model
+        # The model is shared by every classifier in the process; one batch at a time
+        with self._model_handle.use_lock, torch.no_grad():
+            outputs = model(torch.stack(tensors))
+            probabilities = torch.nn.functional.softmax(outputs, dim=1)
+        
+        return [
+            {
+                category: float(prob)
+                for category, prob in zip(self.categories, row.tolist())
+            }
+            for row in probabilities
+        ]
+
+    def _read_source(self, source: ImageSource) -> Optional[Union[bytes, bytearray, memoryview]]:
+        """Encoded image bytes of a source; in-memory sources are used as-is"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return source
+        try:
+            with open(source, 'rb') as f:
+                return f.read()
+        except OSError as e:
+            print(f"Error classifying image {source}: {str(e)}")
+            return None
+
+    def classify_images(self, images: List[ImageSource], batch_size: Optional[int] = None) -> List[Dict[str, any]]:
+        """
+        Classify many images, decoding each once and running batched inference
+        
+        Args:
+            images: Image file paths, or encoded image bytes / memoryviews that
+                are classified without touching the disk
+            batch_size: Images per forward pass (defaults to self.batch_size)
+            
+        Returns:
+            List of metadata dictionaries (same format as get_image_metadata), in input order
+        """
+        batch_size = batch_size or self.batch_size
+        results = [None] * len(images)
+        pending_indices = []
+        pending_tensors = []
+        # New results, written to the cache in one transaction at the end
+        to_cache = {}
+        
+        def flush():
+            for idx, classification in zip(pending_indices, self._classify_batch(pending_tensors)):
+                results[idx]["classification"] = classification
+                results[idx]["predicted_type"] = max(classification.items(), key=lambda x: x[1])[0]
+                to_cache[digests[idx]] = results[idx]
+            pending_indices.clear()
+            pending_tensors.clear()
+        
+        # Read each file once; the bytes are used for hashing and decoding
+        contents = [self._read_source(source) for source in images]
+        
+        digests = [content_hash(data) if data is not None else None for data in contents]
+        # Results are only persisted for trained weights
+        use_cache = self.cache is not None and self.cache_model_id is not None
+        cached = {}
+        if use_cache:
+            cached = self.cache.get_json_many(
+                "image_metadata", self.cache_model_id, [d for d in digests if d]
+            )
+        
+        for idx, source in enumerate(images):
+            if digests[idx] in cached:
+                metadata = cached[digests[idx]]
+                if metadata["dimensions"] is not None:
+                    metadata["dimensions"] = tuple(metadata["dimensions"])
+                results[idx] = metadata
+                self.stats["cached"] += 1
+                continue
+            
+            metadata, tensor = (None, None)
+            if contents[idx] is not None:
+                name = source if isinstance(source, str) else f"#{idx} (in memory)"
+                metadata, tensor = self._decode_image(name, contents[idx])
+                contents[idx] = None
+            if metadata is not None and tensor is None:
+                # Short-circuited by the heuristics
+                results[idx] = metadata
+                self.stats["heuristic"] += 1
+                to_cache[digests[idx]] = metadata
+                continue
+            if tensor is None:
+                self.stats["failed"] += 1
+                classification = self._empty_scores()
+                results[idx] = {
+                    "dimensions": None,
+                    "format": None,
+                    "mode": None,
+                    "classification": classification,
+                    "predicted_type": max(classification.items(), key=lambda x: x[1])[0]
+                }
+                continue
+            
+            results[idx] = metadata
+            self.stats["model"] += 1
+            pending_indices.append(idx)
+            pending_tensors.append(tensor)
+            if len(pending_tensors) >= batch_size:
+                flush()
+        
+        if pending_tensors:
+            flush()
+        if use_cache and to_cache:
+            self.cache.put_json_many("image_metadata", self.cache_model_id, to_cache)
+        
+        return results
+
+    def classify_image(self, image_path: str) -> Dict[str, float]:
+        """
+        Classify an image and return confidence scores for each category
+        """
+        return self.classify_images([image_path])[0]["classification"]
+
+    def train_on_examples(self, training_data: List[Tuple[str, str]], epochs: int = 10):
+        """
+        Train the model on custom examples
+        
+        Args:
+            training_data: List of tuples (image_path, category)
+            epochs: Number of training epochs
+        """
+        # Implementation for fine-tuning the model on custom examples
+        pass  # TODO: Implement training logic
+
+    def get_image_metadata(self, image_path: str) -> Dict[str, any]:
+        """
+        Extract comprehensive image metadata including classification
+        """
+        return self.classify_images([image_path])[0]
+
+    def save_model(self, path: str):
+        """Save the model weights (as safetensors when path ends in .safetensors)"""
+        import torch
+        if self.backend != "fp32":
+            raise ValueError(f"Saving weights requires the fp32 backend, not {self.backend}")
+        if path.endswith(".safetensors"):
+            save_safetensors(self.model.state_dict(), path)
+        else:
+            torch.save(self.model.state_dict(), path)
+
+    def load_model(self, path: str, mmap: bool = False):
+        """
+        Load model weights
+        
+        Args:
+            path: Weights saved by save_model (.safetensors or a torch checkpoint)
+            mmap: Memory-map the file and use its tensors as the parameters
+                instead of copying them in
+        """
+        self.custom_model_path = path
+        self.weights_id = self._weights_id(path)
+        self._mmap_weights = mmap
+        self._acquire_model()
+        if self.backend == "fp32":
+            # Load now, as before; quantized and exported models are built on next use
+            self.model 
\ No newline at end of file
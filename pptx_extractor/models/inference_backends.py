@@ -0,0 +1,235 @@
+"""
+Inference Backends
+CPU inference variants for the ResNet image model and the sentence embedding model
+
+Backends:
+    fp32  PyTorch in full precision (the default)
+    int8  PyTorch with dynamic INT8 quantization of the Linear layers
+    onnx  A graph exported once to disk and run with ONNX Runtime
+"""
+
+import hashlib
+import json
+import os
+from typing import List, Optional, Union
+
+import numpy as np
+
+from utils.result_cache import temp_path
+
+INFERENCE_BACKENDS = ("fp32", "int8", "onnx")
+
+
+def check_backend(backend: str) -> str:
+    """Validate a backend name"""
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(
+            f"Unknown inference backend: {backend} (expected one of {', '.join(INFERENCE_BACKENDS)})"
+        )
+    return backend
+
+
+def default_onnx_dir() -> str:
+    """Directory where exported ONNX graphs are kept between runs"""
+    return os.path.join(os.path.expanduser("~"), ".cache", "pptx_storyboard", "onnx")
+
+
+def quantize_int8(module):
+    """Dynamically quantize the Linear layers of a module to INT8 (CPU only)"""
+    import torch
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _onnx_session(path: str):
+    """
+    ONNX Runtime CPU session for a graph
+
+    The intra-op thread count follows torch's, so worker processes configured
+    with torch.set_num_threads get the same budget (and a single-threaded
+    parent creates sessions that are safe to fork).
+    """
+    import onnxruntime as ort
+    import torch
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = torch.get_num_threads()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+class OnnxImageModel:
+    """Callable stand-in for the ResNet module, backed by an exported graph"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.session = _onnx_session(path)
+
+    def __call__(self, images):
+        import torch
+        logits = self.session.run(["logits"], {"images": images.numpy()})[0]
+        return torch.from_numpy(logits)
+
+    def eval(self):
+        return self
+
+
+def export_image_model(model, path: str, input_size: int = 224):
+    """Export an image classification module to ONNX with a dynamic batch axis"""
+    import torch
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = temp_path(path)
+    with torch.no_grad():
+        torch.onnx.export(
+            model.eval(),
+            torch.zeros(1, 3, input_size, input_size),
+            tmp_path,
+            input_names=["images"],
+            output_names=["logits"],
+            dynamic_axes={"images": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17
+        )
+    os.replace(tmp_path, path)
+
+
+def image_model_path(onnx_dir: Optional[str], weights_id: str) -> str:
+    """Location of the exported graph for a set of ResNet weights"""
+    digest = hashlib.sha256(weights_id.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(onnx_dir or default_onnx_dir(), f"resnet50-{digest}.onnx")
+
+
+class OnnxSentenceEncoder:
+    """
+    Sentence embedding model exported from SentenceTransformer to ONNX
+
+    Tokenization uses the model's own tokenizer; pooling and normalization are
+    replayed in numpy according to the exported pipeline. encode() accepts the
+    arguments this project passes to SentenceTransformer.encode.
+    """
+
+    def __init__(self, export_dir: str):
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(export_dir, "encoder.json"), 'r') as f:
+            self.settings = json.load(f)
+        self.max_seq_length = self.settings["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.join(export_dir, "tokenizer"))
+        self.session = _onnx_session(os.path.join(export_dir, "model.onnx"))
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        mode = self.settings["pooling"]
+        if mode == "cls":
+            return hidden[:, 0]
+        mask = attention_mask[..., None].astype(hidden.dtype)
+        if mode == "mean":
+            return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        # max
+        return np.where(mask > 0, hidden, -1e9).max(axis=1)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               normalize_embeddings: bool = False, convert_to_numpy: bool = True,
+               show_progress_bar: Optional[bool] = None) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        # Longest first, as SentenceTransformer.encode does, so each batch pads
+        # to a similar length; rows are put back in input order below
+        order = np.argsort([-len(sentence) for sentence in sentences], kind="stable")
+        sorted_sentences = [sentences[i] for i in order]
+
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            tokens = self.tokenizer(
+                sorted_sentences[start:start + batch_size], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors="np"
+            )
+            hidden = self.session.run(["last_hidden_state"], {
+                "input_ids": tokens["input_ids"].astype(np.int64),
+                "attention_mask": tokens["attention_mask"].astype(np.int64)
+            })[0]
+            batches.append(self._pool(hidden, tokens["attention_mask"]))
+
+        if batches:
+            embeddings = np.empty((len(sentences), batches[0].shape[1]), dtype=np.float32)
+            embeddings[order] = np.concatenate(batches)
+        else:
+            embeddings = np.zeros((0, self.settings["dimension"]), dtype=np.float32)
+        if normalize_embeddings or self.settings["normalize"]:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+def export_sentence_encoder(model_name: str, export_dir: str):
+    """Export a SentenceTransformer's transformer to ONNX, with its tokenizer and pooling settings"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0]
+    pooling = next(module for module in st_model if isinstance(module, Pooling))
+    mode = pooling.get_pooling_mode_str()
+    if mode not in ("cls", "mean", "max"):
+        raise ValueError(f"Unsupported pooling mode for ONNX export: {mode}")
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, input_ids, attention_mask):
+            return self.auto_model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    os.makedirs(export_dir, exist_ok=True)
+    dummy = transformer.tokenizer(["export"], return_tensors="pt")
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(transformer.auto_model).eval(),
+            (dummy["input_ids"], dummy["attention_mask"]),
+            os.path.join(export_dir, "model.onnx"),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"}
+            },
+            opset_version=17
+        )
+    transformer.tokenizer.save_pretrained(os.path.join(export_dir, "tokenizer"))
+
+    # Written last: its presence marks a complete export
+    with open(os.path.join(export_dir, "encoder.json"), 'w') as f:
+        json.dump({
+            "model_name": model_name,
+            "pooling": mode,
+            "normalize": any(isinstance(module, Normalize) for module in st_model),
+            "max_seq_length": st_model.max_seq_length,
+            "dimension": st_model.get_sentence_embedding_dimension()
+        }, f, indent=2)
+
+
+def load_sentence_encoder(model_name: str, device: Optional[str] = None, backend: str = "fp32",
+                          onnx_dir: Optional[str] = None):
+    """
+    Build a sentence embedding model for a backend
+
+    The int8 and onnx backends run on CPU regardless of device. The ONNX graph
+    is exported on first use and reused from onnx_dir afterwards. The model is
+    read from the active model bundle when it contains it.
+    """
+    from models.model_bundle import bundled_path
+    check_backend(backend)
+    source = bundled_path("sentence_transformer", model_name) or model_name
+
+    if backend == "onnx":
+        export_dir = os.path.join(onnx_dir or default_onnx_dir(), model_name.replace("/", "--"))
+        if not os.path.exists(os.path.join(export_dir, "encoder.json")):
+            export_sentence_encoder(source, export_dir)
+        return OnnxSentenceEncoder(export_dir)
+
+    from sentence_transformers import SentenceTransformer
+    if backend == "int8":
+        return quantize_int8(SentenceTransformer(source, device="cpu"))
+    return SentenceTransformer(source, device=device)
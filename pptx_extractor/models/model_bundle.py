@@ -0,0 +1,195 @@
+"""
+Offline Model Bundle
+Packages every model the storyboard pipeline needs into one local directory,
+so workers without network access (or with a cold hub cache) can load them
+
+Layout:
+    bundle.json                          manifest of the bundled models
+    resnet50.safetensors                 ResNet-50 with the classification head
+    sentence_transformer/<name>/         SentenceTransformer (weights as safetensors)
+    spacy/<name>/                        spaCy pipeline
+
+Usage:
+    python -m models.model_bundle models_bundle [--config config.json]
+
+Point the generator at the bundle with "model_bundle" in the config (or
+--model-bundle on the CLI); models missing from the bundle are loaded as before.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+import struct
+from typing import Dict, Optional
+
+from utils.result_cache import temp_path
+
+BUNDLE_MANIFEST = "bundle.json"
+RESNET_FILENAME = "resnet50.safetensors"
+
+# Bundle consulted by the model factories; set once per process
+_active_bundle = None
+_active_manifest = None
+
+# safetensors dtype names
+_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8",
+    "U8": "uint8", "BOOL": "bool"
+}
+
+
+def use_bundle(bundle_dir: Optional[str]):
+    """Load models from bundle_dir from now on (None to stop using a bundle)"""
+    global _active_bundle, _active_manifest
+    if not bundle_dir:
+        _active_bundle = _active_manifest = None
+        return
+
+    manifest_path = os.path.join(bundle_dir, BUNDLE_MANIFEST)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"Model bundle manifest not found: {manifest_path}")
+    with open(manifest_path, 'r') as f:
+        _active_manifest = json.load(f)
+    _active_bundle = os.path.abspath(bundle_dir)
+
+
+def bundled_path(kind: str, name: str) -> Optional[str]:
+    """
+    Path of a model in the active bundle
+
+    Args:
+        kind: "resnet", "sentence_transformer" or "spacy"
+        name: Model name, e.g. "BAAI/bge-m3" or "en_core_web_sm"
+
+    Returns:
+        Absolute path, or None if no bundle is active or it lacks the model
+    """
+    if _active_manifest is None:
+        return None
+    relative = _active_manifest.get(kind, {}).get(name)
+    if not relative:
+        return None
+    path = os.path.join(_active_bundle, relative)
+    return path if os.path.exists(path) else None
+
+
+def save_safetensors(state_dict: Dict, path: str):
+    """Write a state dict as safetensors (atomically)"""
+    from safetensors.torch import save_file
+
+    tensors = {key: value.detach().contiguous() for key, value in state_dict.items()}
+    tmp_path = temp_path(path)
+    save_file(tensors, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_safetensors(path: str, mmap_weights: bool = True) -> Dict:
+    """
+    Read a safetensors file into a state dict
+
+    With mmap_weights the tensors are views of a private (copy-on-write) memory
+    map of the file: nothing is deserialized, pages are read in as the weights
+    are first touched, and processes loading the same file share those pages.
+    Load the result with load_state_dict(..., assign=True) to keep them.
+    """
+    import torch
+
+    if not mmap_weights:
+        from safetensors.torch import load_file
+        return load_file(path)
+
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header_length = struct.unpack("<Q", buffer[:8])[0]
+    header = json.loads(buffer[8:8 + header_length])
+    data_start = 8 + header_length
+
+    state_dict = {}
+    for key, info in header.items():
+        if key == "__metadata__":
+            continue
+        dtype = getattr(torch, _DTYPES[info["dtype"]])
+        start, end = info["data_offsets"]
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        if count == 0:
+            state_dict[key] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        state_dict[key] = torch.frombuffer(
+            buffer, dtype=dtype, count=count, offset=data_start + start
+        ).reshape(info["shape"])
+    return state_dict
+
+
+def create_bundle(bundle_dir: str, embedding_model: str = "BAAI/bge-m3",
+                  spacy_model: str = "en_core_web_sm",
+                  image_weights: Optional[str] = None) -> Dict:
+    """
+    Package the ResNet, sentence embedding and spaCy models into bundle_dir
+
+    Args:
+        bundle_dir: Output directory (created if needed; existing models are replaced)
+        embedding_model: SentenceTransformer name
+        spacy_model: spaCy pipeline name
+        image_weights: Custom ResNet weights to bundle; without them the bundle
+            holds the ImageNet backbone with a freshly initialized head
+
+    Returns:
+        The bundle manifest
+    """
+    from models.image_classifier import HybridImageClassifier
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    manifest = {"version": 1, "resnet": {}, "sentence_transformer": {}, "spacy": {}}
+
+    classifier = HybridImageClassifier(custom_model_path=image_weights, heuristic_threshold=None)
+    save_safetensors(classifier.model.state_dict(), os.path.join(bundle_dir, RESNET_FILENAME))
+    manifest["resnet"]["resnet50"] = RESNET_FILENAME
+    manifest["categories"] = classifier.categories
+
+    from sentence_transformers import SentenceTransformer
+    relative = os.path.join("sentence_transformer", embedding_model.replace("/", "--"))
+    target = os.path.join(bundle_dir, relative)
+    shutil.rmtree(target, ignore_errors=True)
+    SentenceTransformer(embedding_model, device="cpu").save(target)
+    manifest["sentence_transformer"][embedding_model] = relative
+
+    import spacy
+    relative = os.path.join("spacy", spacy_model)
+    target = os.path.join(bundle_dir, relative)
+    shutil.rmtree(target, ignore_errors=True)
+    spacy.load(spacy_model).to_disk(target)
+    manifest["spacy"][spacy_model] = relative
+
+    # Written last: a bundle without a manifest is incomplete
+    with open(os.path.join(bundle_dir, BUNDLE_MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Package the pipeline's models for offline use")
+    parser.add_argument("bundle_dir", help="Directory to write the bundle to")
+    parser.add_argument("--config", help="Generator configuration to take model names from", default=None)
+    parser.add_argument("--embedding-model", default=None)
+    parser.add_argument("--spacy-model", default="en_core_web_sm")
+    parser.add_argument("--image-weights", help="Custom ResNet weights to bundle", default=None)
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+    embedding_model = args.embedding_model or config.get("embedding_model", "BAAI/bge-m3")
+
+    manifest = create_bundle(args.bundle_dir, embedding_model, args.spacy_model, args.image_weights)
+    for kind in ("resnet", "sentence_transformer", "spacy"):
+        for name, relative in manifest[kind].items():
+            print(f"{kind:<21} {name:<24} {relative}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
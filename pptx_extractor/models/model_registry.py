@@ -0,0 +1,160 @@
+"""
+Shared Model Registry
+Hands out one lazily built, reference-counted instance per model so that the
+generator, classifiers and validator share a single copy of each model
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class _RegistryEntry:
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self.instance = None
+        self.refcount = 0
+        self.lock = threading.Lock()
+        # Held by callers while they run the model (see ModelHandle.use_lock)
+        self.use_lock = threading.Lock()
+
+
+class ModelHandle:
+    """
+    Reference to a shared model
+
+    The model is built on the first call to get(), so holding a handle costs
+    nothing until the model is actually used.
+    """
+
+    def __init__(self, registry: "ModelRegistry", key: Hashable):
+        self._registry = registry
+        self.key = key
+        self._released = False
+
+    def get(self) -> Any:
+        """Return the shared model instance, building it if necessary"""
+        if self._released:
+            raise RuntimeError(f"Model handle {self.key!r} has been released")
+        return self._registry._get(self.key)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._registry.is_loaded(self.key)
+
+    @property
+    def use_lock(self) -> threading.Lock:
+        """
+        Lock shared by every handle to this model, for models that must not
+        run in several threads at once
+        """
+        return self._registry._use_lock(self.key)
+
+    def release(self):
+        """Drop this reference; the model is freed when no handles remain"""
+        if not self._released:
+            self._released = True
+            self._registry._release(self.key)
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, _RegistryEntry] = {}
+
+    def acquire(self, key: Hashable, factory: Callable[[], Any]) -> ModelHandle:
+        """
+        Get a handle to the model identified by key
+
+        Args:
+            key: Hashable identifier, e.g. ("sentence_transformer", name, device)
+            factory: Callable that builds the model on first use
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _RegistryEntry(factory)
+                self._entries[key] = entry
+            entry.refcount += 1
+        return ModelHandle(self, key)
+
+    def _get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries[key]
+        if entry.instance is None:
+            # Build outside the registry lock so unrelated models can load concurrently
+            with entry.lock:
+                if entry.instance is None:
+                    entry.instance = entry.factory()
+        return entry.instance
+
+    def _use_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._entries[key].use_lock
+
+    def _release(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refcount -= 1
+            if entry.refcount <= 0:
+                del self._entries[key]
+
+    def is_loaded(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.instance is not None
+
+    def refcount(self, key: Hashable) -> int:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.refcount if entry else 0
+
+    def loaded_models(self) -> List[Hashable]:
+        """Keys of all models currently resident in memory"""
+        with self._lock:
+            return [key for key, entry in self._entries.items() if entry.instance is not None]
+
+
+# Process-wide registry shared by all components
+registry = ModelRegistry()
+
+
+def shared_sentence_transformer(model_name: str = "BAAI/bge-m3",
+                                device: Optional[str] = None, backend: str = "fp32",
+                                onnx_dir: Optional[str] = None) -> ModelHandle:
+    """
+    Get a handle to a shared sentence embedding model
+
+    backend selects the inference variant (see models.inference_backends); each
+    backend is a separate registry entry.
+    """
+    from models.inference_backends import check_backend
+    check_backend(backend)
+
+    def factory():
+        from models.inference_backends import load_sentence_encoder
+        return load_sentence_encoder(model_name, device, backend, onnx_dir)
+
+    return registry.acquire(("sentence_transformer", model_name, device, backend), factory)
+
+
+def shared_image_model(weights_key: str, backend: str, onnx_dir: Optional[str],
+                       factory: Callable[[], Any]) -> ModelHandle:
+    """
+    Get a handle to a shared ResNet image model
+
+    weights_key identifies the weights (file and version, or this process's
+    untrained head); factory builds the model for backend on first use.
+    """
+    return registry.acquire(("image_model", weights_key, backend, onnx_dir), factory)
+
+
+def shared_spacy(model_name: str = "en_core_web_sm") -> ModelHandle:
+    """Get a handle to a shared spaCy pipeline"""
+    def factory():
+        import spacy
+        from models.model_bundle import bundled_path
+        return spacy.load(bundled_path("spacy", model_name) or model_name)
+
+    return registry.acquire(("spacy", model_name), factory)
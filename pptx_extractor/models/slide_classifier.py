@@ -1,101 +1,236 @@
-"""
-Hybrid Slide Classifier for PowerPoint content
-Combines rule-based and ML-based classification
-"""
-
-from sentence_transformers import SentenceTransformer
-import numpy as np
-from typing import Dict, List, Optional, Tuple
-import re
-import json
-import os
-
-class SlideClassifier:
-    def __init__(self, model_name: str = "BAAI/bge-m3", custom_rules_path: Optional[str] = None):
-        self.categories = [
-            'title', 'disclosure', 'introduction', 'clinical_trial',
-            'patient_case', 'disease_info', 'quiz', 'conclusion'
-        ]
-        
-        # Load BGE-M3 model for semantic understanding
-        self.model = SentenceTransformer(model_name)
-        
-        # Rule-based patterns
-        self.rules = {
-            'title': r'(?i)(title|welcome|overview)',
-            'disclosure': r'(?i)(disclos|conflict.*interest)',
-            'introduction': r'(?i)(introduction|background|overview)',
-            'clinical_trial': r'(?i)(trial|study|phase|clinical|data|results)',
-            'patient_case': r'(?i)(case|patient|presentation)',
-            'quiz': r'(?i)(quiz|question|test|assessment)',
-            'conclusion': r'(?i)(conclusion|summary|key.*points)'
-        }
-        
-        # Load custom rules if available
-        if custom_rules_path and os.path.exists(custom_rules_path):
-            with open(custom_rules_path, 'r') as f:
-                custom_rules = json.load(f)
-                self.rules.update(custom_rules)
-
-    def classify_slide(self, slide_content: Dict[str, any]) -> Dict[str, float]:
-        """
-        Classify a slide using both rule-based and semantic approaches
-        
-        Args:
-            slide_content: Dictionary containing slide text and metadata
-        """
-        scores = {category: 0.0 for category in self.categories}
-        
-        # Rule-based classification
-        text = slide_content.get('text', '')
-        for category, pattern in self.rules.items():
-            if re.search(pattern, text):
-                scores[category] += 0.5
-        
-        # Semantic classification using BGE-M3
-        embeddings = self.model.encode([text])
-        # TODO: Implement semantic matching with pre-defined category descriptions
-        
-        return scores
-
-    def train_on_examples(self, training_data: List[Tuple[Dict, str]]):
-        """
-        Train the classifier on example slides
-        
-        Args:
-            training_data: List of tuples (slide_content, category)
-        """
-        # Update rules based on training examples
-        for slide_content, category in training_data:
-            text = slide_content.get('text', '').lower()
-            words = set(re.findall(r'\w+', text))
-            
-            # Update rules for the category
-            if category in self.rules:
-                pattern = self.rules[category]
-                # TODO: Implement pattern learning from examples
-    
-    def get_slide_type(self, slide_content: Dict[str, any], confidence_threshold: float = 0.7) -> Tuple[str, float]:
-        """
-        Get the predicted slide type and confidence score
-        
-        Returns:
-            Tuple of (predicted_category, confidence_score)
-        """
-        scores = self.classify_slide(slide_content)
-        predicted_category = max(scores.items(), key=lambda x: x[1])
-        
-        if predicted_category[1] < confidence_threshold:
-            return ('unknown', predicted_category[1])
-        
-        return predicted_category
-
-    def save_rules(self, path: str):
-        """Save the current rule patterns"""
-        with open(path, 'w') as f:
-            json.dump(self.rules, f, indent=2)
-
-    def load_rules(self, path: str):
-        """Load custom rule patterns"""
-        with open(path, 'r') as f:
+"""
+Hybrid Slide Classifier for PowerPoint content
+Combines rule-based and ML-based classification
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+import re
+import json
+import os
+
+from models.model_registry import shared_sentence_transformer
+from utils.result_cache import ResultCache, content_hash
+
+class SlideClassifier:
+    def __init__(self, model_name: str = "BAAI/bge-m3", custom_rules_path: Optional[str] = None,
+                 device: Optional[str] = None, cache: Optional[ResultCache] = None,
+                 backend: str = "fp32", onnx_dir: Optional[str] = None):
+        self.categories = [
+            'title', 'disclosure', 'introduction', 'clinical_trial',
+            'patient_case', 'disease_info', 'quiz', 'conclusion'
+        ]
+        
+        # Shared BGE-M3 model for semantic understanding
+        self._model_handle = shared_sentence_transformer(model_name, device, backend, onnx_dir)
+        
+        # Optional persistent embedding cache, keyed by text hash and model version;
+        # quantized and exported variants produce slightly different embeddings
+        self.cache = cache
+        self.cache_model_id = f"{model_name}@1" if backend == "fp32" else f"{model_name}:{backend}@1"
+        
+        # Category descriptions used as semantic prototypes
+        self.category_descriptions = {
+            'title': "Title slide with the presentation name, speaker and date",
+            'disclosure': "Disclosures of conflicts of interest, funding and speaker relationships",
+            'introduction': "Introduction, background and overview of the topic and learning objectives",
+            'clinical_trial': "Clinical trial design, study phase, endpoints, data and results",
+            'patient_case': "Patient case presentation with history, symptoms and treatment",
+            'disease_info': "Disease information covering epidemiology, pathophysiology and diagnosis",
+            'quiz': "Quiz or assessment question with multiple choice answers",
+            'conclusion': "Conclusion, summary and key take-home points"
+        }
+        
+        # Weights for blending rule-based and semantic scores; a confident
+        # semantic probability also counts on its own (see classify_slides)
+        self.rule_weight = 0.5
+        self.semantic_weight = 0.5
+        self.semantic_temperature = 0.05
+        self.batch_size = 32
+        self._prototypes = None
+        self._prototype_descriptions = None
+        
+        # Rule-based patterns
+        self.rules = {
+            'title': r'(?i)(title|welcome|overview)',
+            'disclosure': r'(?i)(disclos|conflict.*interest)',
+            'introduction': r'(?i)(introduction|background|overview)',
+            'clinical_trial': r'(?i)(trial|study|phase|clinical|data|results)',
+            'patient_case': r'(?i)(case|patient|presentation)',
+            'disease_info': r'(?i)(disease|epidemiolog|pathophysiolog|diagnos|prevalence|incidence)',
+            'quiz': r'(?i)(quiz|question|test|assessment)',
+            'conclusion': r'(?i)(conclusion|summary|key.*points)'
+        }
+        
+        # Load custom rules if available
+        if custom_rules_path and os.path.exists(custom_rules_path):
+            with open(custom_rules_path, 'r') as f:
+                custom_rules = json.load(f)
+                self.rules.update(custom_rules)
+
+    @property
+    def model(self):
+        return self._model_handle.get()
+
+    def close(self):
+        """Release the shared model"""
+        self._model_handle.release()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts to normalized embeddings (the encoder batches them by length)"""
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+
+    def encode_slides(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode slide texts
+        
+        Embeddings found in the result cache are reused; only misses are encoded.
+        
+        Returns:
+            Normalized embedding matrix with one row per text, in input order
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        
+        if self.cache is None:
+            return self._encode(texts)
+        
+        digests = [content_hash(text) for text in texts]
+        cached = self.cache.get_array_many("slide_embedding", self.cache_model_id, digests)
+        
+        missing = {}
+        for digest, text in zip(digests, texts):
+            if digest not in cached and digest not in missing:
+                missing[digest] = text
+        if missing:
+            encoded = dict(zip(missing, self._encode(list(missing.values()))))
+            self.cache.put_array_many("slide_embedding", self.cache_model_id, encoded)
+            cached.update(encoded)
+        
+        return np.stack([np.asarray(cached[digest], dtype=np.float32) for digest in digests])
+
+    def _prototype_embeddings(self) -> np.ndarray:
+        """Normalized category prototype embeddings, computed once per description set"""
+        descriptions = [self.category_descriptions.get(c, c.replace('_', ' ')) for c in self.categories]
+        if self._prototypes is None or self._prototype_descriptions != descriptions:
+            self._prototypes = self.model.encode(
+                descriptions, normalize_embeddings=True, convert_to_numpy=True
+            )
+            self._prototype_descriptions = descriptions
+        return self._prototypes
+
+    def _rule_scores(self, texts: List[str]) -> np.ndarray:
+        """Rule-based score matrix of shape (len(texts), len(categories))"""
+        scores = np.zeros((len(texts), len(self.categories)), dtype=np.float32)
+        for col, category in enumerate(self.categories):
+            pattern = self.rules.get(category)
+            if not pattern:
+                continue
+            compiled = re.compile(pattern)
+            for row, text in enumerate(texts):
+                if compiled.search(text):
+                    scores[row, col] = self.rule_weight
+        return scores
+
+    def classify_slides(self, slides: List[Dict[str, any]]) -> List[Dict[str, float]]:
+        """
+        Classify a batch of slides using both rule-based and semantic approaches
+        
+        All slide texts are encoded in a single batched call and scored against the
+        category prototypes with one matrix multiply. A category scores the higher
+        of its blended rule and semantic score and its semantic probability, so
+        semantic evidence alone can reach the confidence threshold.
+        
+        Args:
+            slides: List of dictionaries containing slide text and metadata
+        """
+        texts = [slide.get('text', '') for slide in slides]
+        scores = self._rule_scores(texts)
+        
+        # Semantic classification using BGE-M3 (empty slides keep their rule scores)
+        non_empty = [i for i, text in enumerate(texts) if text.strip()]
+        if non_empty:
+            embeddings = self.encode_slides([texts[i] for i in non_empty])
+            similarities = embeddings @ self._prototype_embeddings().T
+            logits = similarities / self.semantic_temperature
+            logits -= logits.max(axis=1, keepdims=True)
+            probabilities = np.exp(logits)
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+            scores[non_empty] = np.maximum(
+                scores[non_empty] + self.semantic_weight * probabilities, probabilities
+            )
+        
+        return [
+            {category: float(score) for category, score in zip(self.categories, row)}
+            for row in scores
+        ]
+
+    def classify_slide(self, slide_content: Dict[str, any]) -> Dict[str, float]:
+        """
+        Classify a slide using both rule-based and semantic approaches
+        
+        Args:
+            slide_content: Dictionary containing slide text and metadata
+        """
+        return self.classify_slides([slide_content])[0]
+
+    def train_on_examples(self, training_data: List[Tuple[Dict, str]]):
+        """
+        Train the classifier on example slides
+        
+        Args:
+            training_data: List of tuples (slide_content, category)
+        """
+        # Update rules based on training examples
+        for slide_content, category in training_data:
+            text = slide_content.get('text', '').lower()
+            words = set(re.findall(r'\w+', text))
+            
+            # Update rules for the category
+            if category in self.rules:
+                pattern = self.rules[category]
+                # TODO: Implement pattern learning from examples
+    
+    def _select_type(self, scores: Dict[str, float], confidence_threshold: float) -> Tuple[str, float]:
+        predicted_category = max(scores.items(), key=lambda x: x[1])
+        
+        if predicted_category[1] < confidence_threshold:
+            return ('unknown', predicted_category[1])
+        
+        return predicted_category
+
+    def get_slide_type(self, slide_content: Dict[str, any], confidence_threshold: float = 0.7) -> Tuple[str, float]:
+        """
+        Get the predicted slide type and confidence score
+        
+        Returns:
+            Tuple of (predicted_category, confidence_score)
+        """
+        return self._select_type(self.classify_slide(slide_content), confidence_threshold)
+
+    def get_slide_types(self, slides: List[Dict[str, any]], confidence_threshold: float = 0.7) -> List[Tuple[str, float]]:
+        """
+        Get the predicted slide type and confidence score for a batch of slides
+        
+        Returns:
+            List of (predicted_category, confidence_score) tuples in input order
+        """
+        return [
+            self._select_type(scores, confidence_threshold)
+            for scores in self.classify_slides(slides)
+        ]
+
+    def save_rules(self, path: str):
+        """Save the current rule patterns"""
+        with open(path, 'w') as f:
+            json.dump(self.rules, f, indent=2)
+
+    def load_rules(self, path: str):
+        """Load custom rule patterns"""
+        with open(path, 'r') as f:
             self.rules = json.load(f) 
\ No newline at end of file
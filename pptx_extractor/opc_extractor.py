@@ -0,0 +1,416 @@
+"""
+Low-level OPC/XML PowerPoint Extractor
+
+Reads the pptx zip package directly and streams each slide's XML with
+lxml.etree.iterparse, resolving images and notes through the slide .rels parts.
+It never builds the python-pptx object model, so memory stays flat on large,
+media-heavy decks. Records match those of PPTXExtractor.
+"""
+
+import hashlib
+import os
+import posixpath
+import zipfile
+from io import BytesIO
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+from pptx_extractor import describe_image
+
+NS = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "mc": "http://schemas.openxmlformats.org/markup-compatibility/2006",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+    "ct": "http://schemas.openxmlformats.org/package/2006/content-types"
+}
+
+
+def _q(prefix: str, tag: str) -> str:
+    return f"{{{NS[prefix]}}}{tag}"
+
+
+P_SP = _q("p", "sp")
+P_PIC = _q("p", "pic")
+P_GRAPHIC_FRAME = _q("p", "graphicFrame")
+P_TX_BODY = _q("p", "txBody")
+P_PH = _q("p", "ph")
+P_SLD_ID = _q("p", "sldId")
+A_TX_BODY = _q("a", "txBody")
+A_P = _q("a", "p")
+A_T = _q("a", "t")
+A_BR = _q("a", "br")
+A_TBL = _q("a", "tbl")
+A_TR = _q("a", "tr")
+A_TC = _q("a", "tc")
+A_BLIP = _q("a", "blip")
+MC_ALTERNATE_CONTENT = _q("mc", "AlternateContent")
+R_ID = _q("r", "id")
+R_EMBED = _q("r", "embed")
+
+REL_SLIDE = "/slide"
+REL_NOTES_SLIDE = "/notesSlide"
+MEDIA_REL_TYPES = ("image", "media", "video", "audio")
+# Parts hashed into a slide's fingerprint along with its XML
+FINGERPRINT_REL_TYPES = MEDIA_REL_TYPES + ("notesSlide",)
+
+
+class _HashingReader:
+    """File wrapper that hashes everything read through it"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        self.digest.update(data)
+        return data
+
+
+class _ShapeTreeParser:
+    """
+    Incremental parser for a slide's shape tree
+
+    Mirrors what PPTXExtractor reads through python-pptx: text of p:sp shapes
+    (line breaks as vertical tabs, paragraphs joined by newlines), table cell
+    text and the r:embed ids of pictures, in document order. Shapes inside
+    mc:AlternateContent are skipped, as python-pptx does not expose them.
+    """
+
+    def __init__(self):
+        self.texts: List[str] = []
+        self.tables: List[List[List[str]]] = []
+        self.picture_rids: List[str] = []
+        self.body_paragraphs: List[List[str]] = []
+        self.paragraph: Optional[List[str]] = None
+        self.table: Optional[List[List[str]]] = None
+        self.row: Optional[List[str]] = None
+        self.cell_text = ""
+        self.shape_text = ""
+        self.picture_depth = 0
+        self.picture_rid: Optional[str] = None
+        self.alternate_depth = 0
+
+    def start(self, elem):
+        tag = elem.tag
+        if tag == MC_ALTERNATE_CONTENT:
+            self.alternate_depth += 1
+        if self.alternate_depth:
+            return
+
+        if tag == P_TX_BODY or tag == A_TX_BODY:
+            self.body_paragraphs.append([])
+        elif tag == A_P and self.body_paragraphs:
+            self.paragraph = []
+        elif tag == A_TBL:
+            self.table = []
+        elif tag == A_TR and self.table is not None:
+            self.row = []
+        elif tag == P_PIC:
+            self.picture_depth += 1
+
+    def end(self, elem):
+        tag = elem.tag
+        if tag == MC_ALTERNATE_CONTENT:
+            self.alternate_depth -= 1
+            elem.clear()
+            return
+        if self.alternate_depth:
+            return
+
+        if tag == A_T:
+            if self.paragraph is not None:
+                self.paragraph.append(elem.text or "")
+        elif tag == A_BR:
+            if self.paragraph is not None:
+                self.paragraph.append("\v")
+        elif tag == A_P:
+            if self.paragraph is not None and self.body_paragraphs:
+                self.body_paragraphs[-1].append("".join(self.paragraph))
+            self.paragraph = None
+        elif tag == P_TX_BODY or tag == A_TX_BODY:
+            if self.body_paragraphs:
+                body_text = "\n".join(self.body_paragraphs.pop())
+                if self.row is not None:
+                    self.cell_text = body_text
+                else:
+                    self.shape_text = body_text
+        elif tag == A_TC:
+            if self.row is not None:
+                self.row.append(self.cell_text.strip())
+            self.cell_text = ""
+        elif tag == A_TR:
+            if self.table is not None and self.row is not None:
+                self.table.append(self.row)
+            self.row = None
+        elif tag == A_TBL:
+            if self.table is not None:
+                self.tables.append(self.table)
+                table_text = "\n".join(" | ".join(c for c in row if c) for row in self.table).strip()
+                if table_text:
+                    self.texts.append(table_text)
+            self.table = None
+        elif tag == A_BLIP:
+            if self.picture_depth:
+                self.picture_rid = elem.get(R_EMBED)
+        elif tag == P_SP:
+            text = self.shape_text.strip()
+            if text:
+                self.texts.append(text)
+            self.shape_text = ""
+            elem.clear()
+        elif tag == P_PIC:
+            self.picture_depth -= 1
+            if self.picture_rid:
+                self.picture_rids.append(self.picture_rid)
+            self.picture_rid = None
+            elem.clear()
+        elif tag == P_GRAPHIC_FRAME:
+            elem.clear()
+
+
+class OPCExtractor:
+    def __init__(self, pptx_path: str):
+        """
+        Initialize the OPCExtractor with a PowerPoint file path.
+
+        Args:
+            pptx_path (str): Path to the PowerPoint file
+        """
+        if not os.path.exists(pptx_path):
+            raise FileNotFoundError(f"PowerPoint file not found: {pptx_path}")
+
+        self.pptx_path = pptx_path
+        self.package = zipfile.ZipFile(pptx_path)
+        self._content_types = self._read_content_types()
+        self._rels_cache: Dict[str, Dict[str, Tuple[str, str, bool]]] = {}
+        self.slide_partnames = self._read_slide_partnames()
+
+        # SHA-256 digests of media parts, shared by all slides that reference them
+        self._part_digests = {}
+
+    def close(self):
+        """Close the package file"""
+        self.package.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _read_content_types(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Default (by extension) and Override (by part name) content types"""
+        root = etree.fromstring(self.package.read("[Content_Types].xml"))
+        defaults = {
+            elem.get("Extension").lower(): elem.get("ContentType")
+            for elem in root.iter(_q("ct", "Default"))
+        }
+        overrides = {
+            elem.get("PartName").lstrip("/"): elem.get("ContentType")
+            for elem in root.iter(_q("ct", "Override"))
+        }
+        return defaults, overrides
+
+    def _content_type(self, partname: str) -> str:
+        defaults, overrides = self._content_types
+        if partname in overrides:
+            return overrides[partname]
+        return defaults.get(posixpath.splitext(partname)[1].lstrip(".").lower(), "application/octet-stream")
+
+    def _rels(self, partname: str) -> Dict[str, Tuple[str, str, bool]]:
+        """Relationships of a part as rId -> (reltype, target partname, is_external)"""
+        if partname not in self._rels_cache:
+            directory, filename = posixpath.split(partname)
+            rels_name = posixpath.join(directory, "_rels", f"{filename}.rels")
+            rels = {}
+            if rels_name in self.package.NameToInfo:
+                root = etree.fromstring(self.package.read(rels_name))
+                for rel in root.iter(_q("rel", "Relationship")):
+                    external = rel.get("TargetMode") == "External"
+                    target = rel.get("Target")
+                    if not external:
+                        if target.startswith("/"):
+                            target = target.lstrip("/")
+                        else:
+                            target = posixpath.normpath(posixpath.join(directory, target))
+                    rels[rel.get("Id")] = (rel.get("Type"), target, external)
+            self._rels_cache[partname] = rels
+        return self._rels_cache[partname]
+
+    def _read_slide_partnames(self) -> List[str]:
+        """Slide part names in presentation order"""
+        presentation_part = "ppt/presentation.xml"
+        rels = self._rels(presentation_part)
+        partnames = []
+        for _, elem in etree.iterparse(BytesIO(self.package.read(presentation_part)), tag=P_SLD_ID):
+            reltype, target, _ = rels[elem.get(R_ID)]
+            if reltype.endswith(REL_SLIDE):
+                partnames.append(target)
+            elem.clear()
+        return partnames
+
+    def _part_digest(self, partname: str) -> bytes:
+        if partname not in self._part_digests:
+            digest = hashlib.sha256()
+            with self.package.open(partname) as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            self._part_digests[partname] = digest.digest()
+        return self._part_digests[partname]
+
+    def _finish_fingerprint(self, digest, slide_partname: str) -> str:
+        """Add the slide's media and notes parts to a digest of its XML"""
+        for r_id, (reltype, target, external) in sorted(self._rels(slide_partname).items()):
+            if external:
+                continue
+            if reltype.rsplit('/', 1)[-1] in FINGERPRINT_REL_TYPES and target in self.package.NameToInfo:
+                digest.update(r_id.encode("utf-8"))
+                digest.update(self._part_digest(target))
+        return digest.hexdigest()
+
+    def slide_fingerprints(self) -> List[str]:
+        """
+        Fingerprint each slide from its XML, the media it references and its notes.
+
+        Returns:
+            List[str]: One SHA-256 hex digest per slide, in slide order
+        """
+        fingerprints = []
+        for partname in self.slide_partnames:
+            digest = hashlib.sha256()
+            with self.package.open(partname) as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            fingerprints.append(self._finish_fingerprint(digest, partname))
+        return fingerprints
+
+    def _parse_shape_tree(self, stream) -> _ShapeTreeParser:
+        parser = _ShapeTreeParser()
+        for event, elem in etree.iterparse(stream, events=("start", "end")):
+            if event == "start":
+                parser.start(elem)
+            else:
+                parser.end(elem)
+        return parser
+
+    def _notes_text(self, slide_partname: str) -> str:
+        """Text of the body placeholder on the slide's notes page"""
+        notes_partname = None
+        for reltype, target, external in self._rels(slide_partname).values():
+            if not external and reltype.endswith(REL_NOTES_SLIDE):
+                notes_partname = target
+                break
+        if notes_partname is None or notes_partname not in self.package.NameToInfo:
+            return ""
+
+        parser = _ShapeTreeParser()
+        is_body = False
+        with self.package.open(notes_partname) as f:
+            for event, elem in etree.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == P_SP:
+                        is_body = False
+                    parser.start(elem)
+                    continue
+                if elem.tag == P_PH and elem.get("type") == "body":
+                    is_body = True
+                if elem.tag == P_SP:
+                    text = parser.shape_text
+                    if is_body:
+                        return text.strip()
+                    parser.shape_text = ""
+                    elem.clear()
+                    continue
+                parser.end(elem)
+        return ""
+
+    def _iter_selected_slides(self, slide_numbers: Optional[Iterable[int]] = None):
+        selected = set(slide_numbers) if slide_numbers is not None else None
+        for idx, partname in enumerate(self.slide_partnames, 1):
+            if selected is None or idx in selected:
+                yield idx, partname
+
+    def iter_slides(self, output_dir: Optional[str] = None,
+                    slide_numbers: Optional[Iterable[int]] = None,
+                    include_images: bool = True,
+                    keep_image_data: bool = False) -> Iterator[Dict]:
+        """
+        Stream each slide's XML once and yield one record per slide.
+
+        Args:
+            output_dir (str, optional): Directory where images will be saved
+            slide_numbers (Iterable[int], optional): Only walk these slides (1-based)
+            include_images (bool): Set to False to skip reading image blobs
+            keep_image_data (bool): Attach each image's bytes, read straight from
+                the zip, to its entry as a memoryview under "data"
+
+        Yields:
+            Dict: Record with slide_number, fingerprint, text, tables, notes and images
+        """
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        unique_images = {}
+
+        for slide_number, partname in self._iter_selected_slides(slide_numbers):
+            with self.package.open(partname) as raw:
+                stream = _HashingReader(raw)
+                parser = self._parse_shape_tree(stream)
+            fingerprint = self._finish_fingerprint(stream.digest, partname)
+
+            images = []
+            if include_images:
+                rels = self._rels(partname)
+                for r_id in parser.picture_rids:
+                    if r_id not in rels:
+                        continue
+                    _, target, external = rels[r_id]
+                    if external or target not in self.package.NameToInfo:
+                        continue
+                    image_bytes = self.package.read(target)
+                    image_ref = describe_image(
+                        image_bytes, self._content_type(target), output_dir, unique_images
+                    )
+                    images.append({"slide_number": slide_number, **image_ref})
+                    if keep_image_data:
+                        images[-1]["data"] = memoryview(image_bytes)
+
+            yield {
+                "slide_number": slide_number,
+                "fingerprint": fingerprint,
+                "text": "\n".join(parser.texts),
+                "tables": parser.tables,
+                "notes": self._notes_text(partname),
+                "images": images
+            }
+
+    def extract_text(self, slide_numbers: Optional[Iterable[int]] = None) -> List[Dict[str, str]]:
+        """
+        Extract text from all slides in the presentation.
+
+        Returns:
+            List[Dict[str, str]]: List of dictionaries containing slide number and text
+        """
+        return [
+            {"slide_number": record["slide_number"], "text": record["text"]}
+            for record in self.iter_slides(slide_numbers=slide_numbers, include_images=False)
+        ]
+
+    def extract_images(self, output_dir: str,
+                       slide_numbers: Optional[Iterable[int]] = None) -> List[Dict[str, str]]:
+        """
+        Extract images from all slides and save them to the specified directory.
+
+        Returns:
+            List[Dict[str, str]]: List of dictionaries containing image information,
+            one entry per occurrence on a slide
+        """
+        return [
+            image
+            for record in self.iter_slides(output_dir, slide_numbers)
+            for image in record["images"]
+        ]
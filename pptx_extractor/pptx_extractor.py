@@ -1,109 +1,288 @@
-"""
-PowerPoint (PPTX) Text and Image Extractor
-
-This module provides functionality to extract text and images from PowerPoint (PPTX) files.
-It uses python-pptx library for processing PowerPoint files and Pillow for image handling.
-"""
-
-import os
-from typing import Dict, List, Tuple
-from pptx import Presentation
-from PIL import Image
-from io import BytesIO
-
-class PPTXExtractor:
-    def __init__(self, pptx_path: str):
-        """
-        Initialize the PPTXExtractor with a PowerPoint file path.
-        
-        Args:
-            pptx_path (str): Path to the PowerPoint file
-        """
-        if not os.path.exists(pptx_path):
-            raise FileNotFoundError(f"PowerPoint file not found: {pptx_path}")
-        
-        self.pptx_path = pptx_path
-        self.presentation = Presentation(pptx_path)
-
-    def extract_text(self) -> List[Dict[str, str]]:
-        """
-        Extract text from all slides in the presentation.
-        
-        Returns:
-            List[Dict[str, str]]: List of dictionaries containing slide number and text
-        """
-        text_content = []
-        
-        for idx, slide in enumerate(self.presentation.slides, 1):
-            slide_text = []
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text = shape.text.strip()
-                    if text:
-                        slide_text.append(text)
-            
-            text_content.append({
-                "slide_number": idx,
-                "text": "\n".join(slide_text)
-            })
-        
-        return text_content
-
-    def extract_images(self, output_dir: str) -> List[Dict[str, str]]:
-        """
-        Extract images from all slides and save them to the specified directory.
-        
-        Args:
-            output_dir (str): Directory where images will be saved
-            
-        Returns:
-            List[Dict[str, str]]: List of dictionaries containing image information
-        """
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            
-        image_info = []
-        image_count = 0
-        
-        for slide_number, slide in enumerate(self.presentation.slides, 1):
-            for shape in slide.shapes:
-                if hasattr(shape, "image"):
-                    image_count += 1
-                    image_bytes = shape.image.blob
-                    image_type = shape.image.content_type.split('/')[-1]
-                    image_filename = f"slide_{slide_number}_image_{image_count}.{image_type}"
-                    image_path = os.path.join(output_dir, image_filename)
-                    
-                    # Save the image
-                    with open(image_path, 'wb') as img_file:
-                        img_file.write(image_bytes)
-                    
-                    # Get image dimensions
-                    with Image.open(BytesIO(image_bytes)) as img:
-                        width, height = img.size
-                    
-                    image_info.append({
-                        "slide_number": slide_number,
-                        "filename": image_filename,
-                        "path": image_path,
-                        "dimensions": f"{width}x{height}",
-                        "format": image_type
-                    })
-        
-        return image_info
-
-def extract_all(pptx_path: str, images_output_dir: str) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
-    """
-    Convenience function to extract both text and images from a PowerPoint file.
-    
-    Args:
-        pptx_path (str): Path to the PowerPoint file
-        images_output_dir (str): Directory where images will be saved
-        
-    Returns:
-        Tuple[List[Dict[str, str]], List[Dict[str, str]]]: Tuple containing text content and image information
-    """
-    extractor = PPTXExtractor(pptx_path)
-    text_content = extractor.extract_text()
-    image_info = extractor.extract_images(images_output_dir)
+"""
+PowerPoint (PPTX) Text and Image Extractor
+
+This module provides functionality to extract text and images from PowerPoint (PPTX) files.
+It uses python-pptx library for processing PowerPoint files and Pillow for image handling.
+"""
+
+import os
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from pptx import Presentation
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+from PIL import Image
+from io import BytesIO
+
+from utils.image_probe import probe_image
+
+def image_dimensions(image_bytes: bytes) -> str:
+    """
+    Dimensions of an image as "WIDTHxHEIGHT", read from its header.
+    
+    Pixels are only decoded when the header cannot be parsed, and images Pillow
+    cannot open either are reported as "unknown".
+    """
+    probed = probe_image(image_bytes)
+    if probed:
+        _, width, height = probed
+        return f"{width}x{height}"
+    
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            width, height = img.size
+    except Exception:
+        return "unknown"
+    return f"{width}x{height}"
+
+def describe_image(image_bytes: bytes, content_type: str, output_dir: Optional[str],
+                   unique_images: Dict[str, Dict]) -> Dict[str, str]:
+    """
+    Describe an image blob, writing it to output_dir the first time its content is seen.
+    
+    Args:
+        image_bytes (bytes): Image content
+        content_type (str): MIME type of the image part, e.g. "image/png"
+        output_dir (str, optional): Directory where images will be saved
+        unique_images (Dict[str, Dict]): Descriptions seen so far, keyed by content hash
+        
+    Returns:
+        Dict[str, str]: Image information (filename, path, dimensions, format, hash)
+    """
+    image_hash = hashlib.sha256(image_bytes).hexdigest()
+    
+    if image_hash not in unique_images:
+        image_type = content_type.split('/')[-1]
+        image_filename = f"image_{image_hash[:16]}.{image_type}"
+        image_path = None
+        
+        if output_dir:
+            image_path = os.path.join(output_dir, image_filename)
+            # Save the image unless an identical one is already on disk
+            if not os.path.exists(image_path):
+                with open(image_path, 'wb') as img_file:
+                    img_file.write(image_bytes)
+        
+        unique_images[image_hash] = {
+            "filename": image_filename,
+            "path": image_path,
+            "dimensions": image_dimensions(image_bytes),
+            "format": image_type,
+            "hash": image_hash
+        }
+    
+    return unique_images[image_hash]
+
+class PPTXExtractor:
+    def __init__(self, pptx_path: str):
+        """
+        Initialize the PPTXExtractor with a PowerPoint file path.
+        
+        Args:
+            pptx_path (str): Path to the PowerPoint file
+        """
+        if not os.path.exists(pptx_path):
+            raise FileNotFoundError(f"PowerPoint file not found: {pptx_path}")
+        
+        self.pptx_path = pptx_path
+        self.presentation = Presentation(pptx_path)
+        
+        # SHA-256 digests of media parts, shared by all slides that reference them
+        self._part_digests = {}
+
+    def close(self):
+        """Release the presentation (python-pptx has already closed the file)"""
+        self.presentation = None
+        self._part_digests = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _iter_selected_slides(self, slide_numbers: Optional[Iterable[int]] = None):
+        """Yield (slide_number, slide) pairs, optionally restricted to slide_numbers"""
+        selected = set(slide_numbers) if slide_numbers is not None else None
+        for idx, slide in enumerate(self.presentation.slides, 1):
+            if selected is None or idx in selected:
+                yield idx, slide
+
+    def _slide_fingerprint(self, slide) -> str:
+        """SHA-256 of a slide's XML and the media and notes parts it references"""
+        digest = hashlib.sha256(slide.part.blob)
+        for r_id, rel in sorted(slide.part.rels.items()):
+            if rel.is_external:
+                continue
+            if rel.reltype.rsplit('/', 1)[-1] in ("image", "media", "video", "audio", "notesSlide"):
+                part = rel.target_part
+                if part.partname not in self._part_digests:
+                    self._part_digests[part.partname] = hashlib.sha256(part.blob).digest()
+                digest.update(r_id.encode("utf-8"))
+                digest.update(self._part_digests[part.partname])
+        return digest.hexdigest()
+
+    def slide_fingerprints(self) -> List[str]:
+        """
+        Fingerprint each slide from its XML, the media it references and its notes.
+        
+        Returns:
+            List[str]: One SHA-256 hex digest per slide, in slide order
+        """
+        return [self._slide_fingerprint(slide) for slide in self.presentation.slides]
+
+    def _walk_shapes(self, shapes):
+        """Yield every shape in a shape tree, descending into group shapes"""
+        for shape in shapes:
+            if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+                yield from self._walk_shapes(shape.shapes)
+            else:
+                yield shape
+
+    def _image_ref(self, image, output_dir: Optional[str], unique_images: Dict[str, Dict]) -> Dict[str, str]:
+        """
+        Describe an image, writing it to output_dir the first time its content is seen
+        """
+        return describe_image(image.blob, image.content_type, output_dir, unique_images)
+
+    def iter_slides(self, output_dir: Optional[str] = None,
+                    slide_numbers: Optional[Iterable[int]] = None,
+                    include_images: bool = True,
+                    keep_image_data: bool = False) -> Iterator[Dict]:
+        """
+        Walk each slide's shape tree once and yield one record per slide.
+        
+        Group shapes are descended into, table cell text is collected and
+        speaker notes are included. Images are deduplicated by content hash
+        across the whole walk and written to output_dir if one is given.
+        
+        Args:
+            output_dir (str, optional): Directory where images will be saved
+            slide_numbers (Iterable[int], optional): Only walk these slides (1-based)
+            include_images (bool): Set to False to skip reading image blobs
+            keep_image_data (bool): Attach each image's bytes to its entry as a
+                memoryview under "data", so it can be processed without a file
+            
+        Yields:
+            Dict: Record with slide_number, fingerprint, text, tables, notes and images
+        """
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        
+        unique_images = {}
+        
+        for slide_number, slide in self._iter_selected_slides(slide_numbers):
+            slide_text = []
+            tables = []
+            images = []
+            
+            for shape in self._walk_shapes(slide.shapes):
+                if getattr(shape, "has_table", False) and shape.has_table:
+                    rows = [[cell.text.strip() for cell in row.cells] for row in shape.table.rows]
+                    tables.append(rows)
+                    table_text = "\n".join(" | ".join(c for c in row if c) for row in rows).strip()
+                    if table_text:
+                        slide_text.append(table_text)
+                    continue
+                
+                if hasattr(shape, "text"):
+                    text = shape.text.strip()
+                    if text:
+                        slide_text.append(text)
+                
+                if include_images and hasattr(shape, "image"):
+                    image = shape.image
+                    image_ref = self._image_ref(image, output_dir, unique_images)
+                    images.append({"slide_number": slide_number, **image_ref})
+                    if keep_image_data:
+                        images[-1]["data"] = memoryview(image.blob)
+            
+            notes = ""
+            if slide.has_notes_slide:
+                notes_frame = slide.notes_slide.notes_text_frame
+                if notes_frame is not None:
+                    notes = notes_frame.text.strip()
+            
+            yield {
+                "slide_number": slide_number,
+                "fingerprint": self._slide_fingerprint(slide),
+                "text": "\n".join(slide_text),
+                "tables": tables,
+                "notes": notes,
+                "images": images
+            }
+
+    def extract_text(self, slide_numbers: Optional[Iterable[int]] = None) -> List[Dict[str, str]]:
+        """
+        Extract text from all slides in the presentation.
+        
+        Args:
+            slide_numbers (Iterable[int], optional): Only extract these slides (1-based)
+        
+        Returns:
+            List[Dict[str, str]]: List of dictionaries containing slide number and text
+        """
+        return [
+            {"slide_number": record["slide_number"], "text": record["text"]}
+            for record in self.iter_slides(slide_numbers=slide_numbers, include_images=False)
+        ]
+
+    def extract_images(self, output_dir: str,
+                       slide_numbers: Optional[Iterable[int]] = None) -> List[Dict[str, str]]:
+        """
+        Extract images from all slides and save them to the specified directory.
+        
+        Images are keyed by a hash of their content: each unique image is written
+        once (as image_<hash>.<ext>) and every slide that uses it references the
+        same file. Files already present from an earlier deck are not rewritten.
+        
+        Args:
+            output_dir (str): Directory where images will be saved
+            slide_numbers (Iterable[int], optional): Only extract these slides (1-based)
+            
+        Returns:
+            List[Dict[str, str]]: List of dictionaries containing image information,
+            one entry per occurrence on a slide
+        """
+        return [
+            image
+            for record in self.iter_slides(output_dir, slide_numbers)
+            for image in record["images"]
+        ]
+
+EXTRACTION_ENGINES = ("python-pptx", "opc")
+
+def create_extractor(pptx_path: str, engine: str = "python-pptx"):
+    """
+    Create an extractor for a PowerPoint file.
+    
+    Args:
+        pptx_path (str): Path to the PowerPoint file
+        engine (str): "python-pptx" builds the full python-pptx object model;
+            "opc" streams the slide XML straight from the zip package, which is
+            much lighter on large, media-heavy decks
+            
+    Returns:
+        PPTXExtractor or OPCExtractor: Both return the same records
+    """
+    if engine == "python-pptx":
+        return PPTXExtractor(pptx_path)
+    if engine == "opc":
+        from opc_extractor import OPCExtractor
+        return OPCExtractor(pptx_path)
+    raise ValueError(f"Unknown extraction engine: {engine} (expected one of {', '.join(EXTRACTION_ENGINES)})")
+
+def extract_all(pptx_path: str, images_output_dir: str) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """
+    Convenience function to extract both text and images from a PowerPoint file.
+    
+    Args:
+        pptx_path (str): Path to the PowerPoint file
+        images_output_dir (str): Directory where images will be saved
+        
+    Returns:
+        Tuple[List[Dict[str, str]], List[Dict[str, str]]]: Tuple containing text content and image information
+    """
+    extractor = PPTXExtractor(pptx_path)
+    text_content = extractor.extract_text()
+    image_info = extractor.extract_images(images_output_dir)
     return text_content, image_info 
\ No newline at end of file
@@ -0,0 +1,278 @@
+"""
+Storyboard Server
+Keeps a warm StoryboardGenerator resident and accepts jobs over localhost HTTP
+
+Endpoints:
+    POST /jobs        {"pptx_path": ..., "output_path": ..., "incremental": false}
+                      -> 202 {"id": ..., "status": "queued"}, or 503 when the queue is full
+    GET  /jobs/<id>   -> job status, including timings and any error
+    GET  /health      -> queue and worker state
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class StoryboardJobQueue:
+    def __init__(self, config_path: Optional[str] = None, max_queue: int = 16,
+                 concurrency: int = 1, max_history: int = 1000):
+        """
+        Initialize the job queue and its worker threads
+
+        Args:
+            config_path: Generator configuration file
+            max_queue: Maximum number of jobs waiting to run
+            concurrency: Number of jobs processed at the same time; each slot
+                owns a generator (and its per-job image stats), while the
+                embedding, spaCy and ResNet models are loaded once and shared
+                between them through the model registry; spaCy and ResNet
+                inference runs one slot at a time
+            max_history: Number of finished jobs kept for status queries
+        """
+        from storyboard_generator import StoryboardGenerator
+
+        self.max_history = max_history
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._running = 0
+
+        self._generators = []
+        for _ in range(max(1, concurrency)):
+            generator = StoryboardGenerator(config_path)
+            generator.warm_up()
+            self._generators.append(generator)
+
+        self._workers = [
+            threading.Thread(target=self._work, args=(generator,), daemon=True)
+            for generator in self._generators
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, pptx_path: str, output_path: str, incremental: bool = False) -> Dict:
+        """Queue a job; raises QueueFullError when the queue is at capacity"""
+        job = {
+            "id": uuid.uuid4().hex,
+            "pptx_path": pptx_path,
+            "output_path": output_path,
+            "incremental": incremental,
+            "status": "queued",
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+            "slides": None,
+            "image_stats": None,
+            "error": None
+        }
+
+        with self._lock:
+            try:
+                self._queue.put_nowait(job["id"])
+            except queue.Full:
+                raise QueueFullError(f"Job queue is full ({self._queue.maxsize} jobs waiting)")
+            self._jobs[job["id"]] = job
+            self._trim_history()
+            return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "running": self._running,
+                "concurrency": len(self._workers)
+            }
+
+    def _trim_history(self):
+        """Forget the oldest finished jobs beyond max_history"""
+        finished = [job_id for job_id, job in self._jobs.items() if job["finished"] is not None]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def _work(self, generator):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs[job_id]
+                job["status"] = "running"
+                job["started"] = time.time()
+                self._running += 1
+
+            try:
+                output_dir = os.path.dirname(job["output_path"])
+                if output_dir:
+                    os.makedirs(output_dir, exist_ok=True)
+                manifest_path = f"{job['output_path']}.manifest.json" if job["incremental"] else None
+                generator.image_classifier.reset_stats()
+                processed_content = generator.process_pptx(job["pptx_path"], manifest_path)
+                generator.generate_storyboard(processed_content, job["output_path"])
+                update = {
+                    "status": "done",
+                    "slides": len(processed_content),
+                    "image_stats": dict(generator.image_classifier.stats)
+                }
+            except Exception as e:
+                traceback.print_exc()
+                update = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+            with self._lock:
+                job.update(update)
+                job["finished"] = time.time()
+                self._running -= 1
+            self._queue.task_done()
+
+    def close(self):
+        for generator in self._generators:
+            generator.close()
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    job_queue: StoryboardJobQueue = None
+
+    def _send_json(self, status: int, body: Dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", **self.job_queue.stats()})
+            return
+
+        if self.path.startswith("/jobs/"):
+            job = self.job_queue.get(self.path[len("/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "Unknown job"})
+            else:
+                self._send_json(200, job)
+            return
+
+        self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            pptx_path = request["pptx_path"]
+            output_path = request["output_path"]
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"error": f"Invalid job request: {e}"})
+            return
+
+        if not os.path.exists(pptx_path):
+            self._send_json(400, {"error": f"PowerPoint file not found: {pptx_path}"})
+            return
+
+        try:
+            job = self.job_queue.submit(pptx_path, output_path, bool(request.get("incremental")))
+        except QueueFullError as e:
+            self._send_json(503, {"error": str(e)})
+            return
+
+        self._send_json(202, job)
+
+    def log_message(self, format, *args):
+        # Jobs are reported by the workers; keep request logging quiet
+        pass
+
+
+def serve(config_path: Optional[str] = None, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          max_queue: int = 16, concurrency: int = 1):
+    """Run the server until interrupted"""
+    print("Loading models...")
+    job_queue = StoryboardJobQueue(config_path, max_queue=max_queue, concurrency=concurrency)
+
+    handler = type("StoryboardRequestHandler", (_RequestHandler,), {"job_queue": job_queue})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    print(f"Storyboard server listening on http://{host}:{port}")
+
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        job_queue.close()
+
+
+def _request(url: str, method: str = "GET", body: Optional[Dict] = None) -> Dict:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read()).get("error", e.reason)
+        except ValueError:
+            message = e.reason
+        raise RuntimeError(f"Server returned {e.code}: {message}")
+
+
+def submit_job(server_url: str, pptx_path: str, output_path: str, incremental: bool = False) -> Dict:
+    """Submit a job to a running server; paths are sent as absolute paths"""
+    return _request(f"{server_url.rstrip('/')}/jobs", "POST", {
+        "pptx_path": os.path.abspath(pptx_path),
+        "output_path": os.path.abspath(output_path),
+        "incremental": incremental
+    })
+
+
+def wait_for_job(server_url: str, job_id: str, poll_interval: float = 0.2) -> Dict:
+    """Poll a job until it has finished"""
+    while True:
+        job = _request(f"{server_url.rstrip('/')}/jobs/{job_id}")
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the warm-model storyboard server")
+    parser.add_argument("--config", help="Path to configuration file", default=None)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-queue", type=int, default=16,
+                        help="Maximum number of jobs waiting to run")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of jobs processed at the same time")
+    args = parser.parse_args()
+
+    serve(args.config, args.host, args.port, args.max_queue, args.concurrency)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
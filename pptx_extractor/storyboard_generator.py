@@ -1,211 +1,496 @@
-"""
-Storyboard Generator
-Converts PowerPoint presentations to structured storyboard documents
-"""
-
-import os
-from typing import Dict, List, Optional, Tuple
-from docx import Document
-from docx.shared import Inches
-from pptx import Presentation
-import json
-from sentence_transformers import SentenceTransformer
-import numpy as np
-
-from models.image_classifier import HybridImageClassifier
-from models.slide_classifier import SlideClassifier
-from utils.abbreviation_handler import AbbreviationHandler
-from utils.content_validator import ContentValidator
-from pptx_extractor import PPTXExtractor
-
-class StoryboardGenerator:
-    def __init__(self, config_path: Optional[str] = None):
-        """
-        Initialize the storyboard generator
-        
-        Args:
-            config_path: Path to configuration file
-        """
-        # Initialize components
-        self.image_classifier = HybridImageClassifier()
-        self.slide_classifier = SlideClassifier()
-        self.abbreviation_handler = AbbreviationHandler()
-        self.content_validator = ContentValidator()
-        self.pptx_extractor = None
-        
-        # Load BGE-M3 for semantic matching
-        self.model = SentenceTransformer("BAAI/bge-m3")
-        
-        # Load configuration if available
-        self.config = {
-            "template_path": None,
-            "instruction_path": None,
-            "output_path": "output",
-            "training_pairs_path": None
-        }
-        
-        if config_path and os.path.exists(config_path):
-            with open(config_path, 'r') as f:
-                self.config.update(json.load(f))
-
-    def load_training_data(self):
-        """Load and process training examples"""
-        if not self.config["training_pairs_path"]:
-            return
-        
-        # TODO: Implement training data processing
-        pass
-
-    def process_pptx(self, pptx_path: str) -> Dict:
-        """
-        Process PowerPoint file and extract structured content
-        """
-        self.pptx_extractor = PPTXExtractor(pptx_path)
-        
-        # Extract text and images
-        text_content = self.pptx_extractor.extract_text()
-        image_info = self.pptx_extractor.extract_images("temp_images")
-        
-        # Process each slide
-        processed_content = []
-        for slide_idx, slide in enumerate(text_content):
-            # Classify slide
-            slide_type = self.slide_classifier.get_slide_type(slide)
-            
-            # Process text for abbreviations
-            highlighted_text, abbreviations = self.abbreviation_handler.highlight_abbreviations(
-                slide["text"]
-            )
-            
-            # Validate content
-            validation_results = self.content_validator.validate_content(slide["text"])
-            
-            # Get images for this slide
-            slide_images = [
-                img for img in image_info
-                if img["slide_number"] == slide_idx + 1
-            ]
-            
-            # Classify images
-            for img in slide_images:
-                img["semantic_type"] = self.image_classifier.get_image_metadata(img["path"])
-            
-            processed_content.append({
-                "slide_number": slide["slide_number"],
-                "slide_type": slide_type,
-                "text": highlighted_text,
-                "abbreviations": abbreviations,
-                "images": slide_images,
-                "validation_results": validation_results
-            })
-        
-        return processed_content
-
-    def generate_storyboard(self, processed_content: Dict, output_path: str):
-        """
-        Generate storyboard document from processed content
-        """
-        # Create new document or load template
-        doc = Document(self.config["template_path"]) if self.config["template_path"] else Document()
-        
-        # Create contents chapters table
-        self._create_contents_table(doc, processed_content)
-        
-        # Create abbreviations table
-        self._create_abbreviations_table(doc)
-        
-        # Create content tables for each slide
-        for slide in processed_content:
-            self._create_slide_content_table(doc, slide)
-        
-        # Create question tables if applicable
-        for slide in processed_content:
-            if slide["slide_type"][0] == "quiz":
-                self._create_question_table(doc, slide)
-        
-        # Save document
-        doc.save(output_path)
-
-    def _create_contents_table(self, doc: Document, content: Dict):
-        """Create table of contents"""
-        table = doc.add_table(rows=1, cols=2)
-        table.style = 'Table Grid'
-        table.rows[0].cells[0].text = "Chapter"
-        table.rows[0].cells[1].text = "Subchapter"
-        
-        # TODO: Implement chapter organization logic
-
-    def _create_abbreviations_table(self, doc: Document):
-        """Create abbreviations table"""
-        abbrev_list = self.abbreviation_handler.create_abbreviations_table()
-        if abbrev_list:
-            table = doc.add_table(rows=1, cols=2)
-            table.style = 'Table Grid'
-            table.rows[0].cells[0].text = "Abbreviation"
-            table.rows[0].cells[1].text = "Definition"
-            
-            for abbrev in abbrev_list:
-                row = table.add_row()
-                row.cells[0].text = abbrev["abbreviation"]
-                row.cells[1].text = abbrev["definition"]
-
-    def _create_slide_content_table(self, doc: Document, slide: Dict):
-        """Create content table for a slide"""
-        table = doc.add_table(rows=8, cols=2)
-        table.style = 'Table Grid'
-        
-        # Fill in table cells
-        cells = [
-            ("Chapter", ""),  # To be filled based on content organization
-            ("Subchapter", ""),
-            ("Text", slide["text"]),
-            ("Media/Images", self._format_image_info(slide["images"])),
-            ("Visual Details", self._format_visual_details(slide)),
-            ("Interactivity Details", ""),  # To be filled based on slide type
-            ("References", ""),  # To be extracted from slide content
-            ("Extra Details/Settings", "")
-        ]
-        
-        for idx, (header, content) in enumerate(cells):
-            table.rows[idx].cells[0].text = header
-            table.rows[idx].cells[1].text = content
-
-    def _create_question_table(self, doc: Document, slide: Dict):
-        """Create table for quiz questions"""
-        if slide["slide_type"][0] != "quiz":
-            return
-            
-        table = doc.add_table(rows=1, cols=2)
-        table.style = 'Table Grid'
-        # TODO: Implement question table formatting
-
-    def _format_image_info(self, images: List[Dict]) -> str:
-        """Format image information for the table"""
-        if not images:
-            return "No images"
-            
-        return "\n".join(
-            f"Image {idx+1}: {img['semantic_type']['predicted_type']} "
-            f"({img['dimensions']})"
-            for idx, img in enumerate(images)
-        )
-
-    def _format_visual_details(self, slide: Dict) -> str:
-        """Format visual details for the table"""
-        details = []
-        if slide["images"]:
-            details.append("Contains visual elements:")
-            for img in slide["images"]:
-                details.append(f"- {img['semantic_type']['predicted_type']}")
-        
-        return "\n".join(details) if details else "No specific visual details"
-
-    def save_config(self, path: str):
-        """Save current configuration"""
-        with open(path, 'w') as f:
-            json.dump(self.config, f, indent=2)
-
-    def load_config(self, path: str):
-        """Load configuration"""
-        with open(path, 'r') as f:
+"""
+Storyboard Generator
+Converts PowerPoint presentations to structured storyboard documents
+"""
+
+import os
+import shutil
+import tempfile
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import json
+
+from models.image_classifier import HybridImageClassifier
+from models.model_bundle import use_bundle
+from models.model_registry import shared_sentence_transformer
+from models.slide_classifier import SlideClassifier
+from utils.abbreviation_handler import AbbreviationHandler
+from utils.content_validator import ContentValidator
+from utils.docx_writer import TableTemplate, add_rows, template_cache
+from utils.result_cache import ResultCache, temp_path
+from pptx_extractor import create_extractor
+
+if TYPE_CHECKING:
+    from docx.document import Document
+
+# Heavy dependencies (torch, torchvision, sentence_transformers, spacy, docx) are
+# imported on first use; models are built only when a stage needs them
+
+# Row headers of the per-slide content table
+SLIDE_TABLE_HEADERS = (
+    "Chapter", "Subchapter", "Text", "Media/Images", "Visual Details",
+    "Interactivity Details", "References", "Extra Details/Settings"
+)
+
+class StoryboardGenerator:
+    def __init__(self, config_path: Optional[str] = None):
+        """
+        Initialize the storyboard generator
+        
+        Args:
+            config_path: Path to configuration file
+        """
+        # Load configuration if available
+        self.config = {
+            "template_path": None,
+            "instruction_path": None,
+            "output_path": "output",
+            "training_pairs_path": None,
+            "embedding_model": "BAAI/bge-m3",
+            "device": None,
+            "embedding_backend": "fp32",
+            "image_backend": "fp32",
+            "onnx_dir": None,
+            "model_bundle": None,
+            "extraction_engine": "python-pptx",
+            "image_export_dir": None,
+            "spill_images_to_disk": False,
+            "slide_batch_size": 32,
+            "ner_batch_size": 64,
+            "ner_n_process": 1,
+            "term_index_dir": None,
+            "term_similarity_threshold": 0.8,
+            "term_ngram_threshold": 0.6,
+            "replacements_path": None,
+            "image_heuristic_threshold": 0.9,
+            "cache_dir": None,
+            "cache_max_bytes": 2 * 1024 ** 3
+        }
+        
+        if config_path and os.path.exists(config_path):
+            with open(config_path, 'r') as f:
+                self.config.update(json.load(f))
+        
+        # Load models from the offline bundle when one is configured
+        if self.config["model_bundle"]:
+            use_bundle(self.config["model_bundle"])
+        
+        # Initialize components; BGE-M3 and spaCy are shared through the model registry
+        embedding_model = self.config["embedding_model"]
+        device = self.config["device"]
+        embedding_backend = self.config["embedding_backend"]
+        onnx_dir = self.config["onnx_dir"]
+        
+        # Persistent cache of embeddings, image classifications and entities
+        self.cache = None
+        if self.config["cache_dir"]:
+            self.cache = ResultCache(self.config["cache_dir"], self.config["cache_max_bytes"])
+        
+        self.image_classifier = HybridImageClassifier(
+            cache=self.cache, heuristic_threshold=self.config["image_heuristic_threshold"],
+            backend=self.config["image_backend"], onnx_dir=onnx_dir
+        )
+        self.slide_classifier = SlideClassifier(
+            embedding_model, device=device, cache=self.cache,
+            backend=embedding_backend, onnx_dir=onnx_dir
+        )
+        self.abbreviation_handler = AbbreviationHandler()
+        # The restricted-term index lives next to the result cache unless placed explicitly
+        term_index_dir = self.config["term_index_dir"]
+        if term_index_dir is None and self.config["cache_dir"]:
+            term_index_dir = os.path.join(self.config["cache_dir"], "term_index")
+        self.content_validator = ContentValidator(
+            model_name=embedding_model, device=device, cache=self.cache,
+            backend=embedding_backend, onnx_dir=onnx_dir,
+            ner_batch_size=self.config["ner_batch_size"], ner_n_process=self.config["ner_n_process"],
+            term_index_dir=term_index_dir,
+            similarity_threshold=self.config["term_similarity_threshold"],
+            ngram_threshold=self.config["term_ngram_threshold"],
+            replacements_path=self.config["replacements_path"]
+        )
+        self.pptx_extractor = None
+        
+        # Shared BGE-M3 handle for semantic matching
+        self._model_handle = shared_sentence_transformer(embedding_model, device, embedding_backend, onnx_dir)
+
+    @property
+    def model(self):
+        return self._model_handle.get()
+
+    def warm_up(self):
+        """Load every model now instead of on first use"""
+        self.image_classifier.model
+        self.slide_classifier.model
+        self.content_validator.nlp
+        self.content_validator.model
+        # Encode the restricted terms once here, so forked workers inherit the index
+        if self.content_validator.near_matches_enabled:
+            self.content_validator.term_index
+
+    def reset_after_fork(self):
+        """Reopen per-process resources in a forked worker"""
+        if self.cache is not None:
+            # SQLite connections must not be shared across processes
+            self.cache = ResultCache(self.config["cache_dir"], self.config["cache_max_bytes"])
+            self.image_classifier.cache = self.cache
+            self.slide_classifier.cache = self.cache
+            self.content_validator.cache = self.cache
+
+    def close(self):
+        """Release shared models held by this generator and its components"""
+        self.slide_classifier.close()
+        self.content_validator.close()
+        self.image_classifier.close()
+        self._model_handle.release()
+        if self.cache is not None:
+            self.cache.close()
+
+    def load_training_data(self):
+        """Load and process training examples"""
+        if not self.config["training_pairs_path"]:
+            return
+        
+        # TODO: Implement training data processing
+        pass
+
+    def process_pptx(self, pptx_path: str, manifest_path: Optional[str] = None) -> Dict:
+        """
+        Process PowerPoint file and extract structured content
+        
+        Args:
+            pptx_path: Path to the PowerPoint file
+            manifest_path: Optional per-deck manifest of processed slides. When given,
+                only slides whose fingerprint changed since the last run are recomputed
+                and the manifest is updated afterwards.
+        """
+        self.pptx_extractor = create_extractor(pptx_path, self.config["extraction_engine"])
+        
+        try:
+            entries = {}
+            changed = None
+            if manifest_path:
+                # Reuse results of unchanged slides from the previous run; fingerprinting
+                # takes a pass over every slide, so it only happens with a manifest
+                previous = self._load_manifest(manifest_path)
+                changed = []
+                for slide_number, fingerprint in enumerate(self.pptx_extractor.slide_fingerprints(), 1):
+                    if fingerprint in previous:
+                        entries[slide_number] = self._renumber_entry(previous[fingerprint], slide_number)
+                    else:
+                        changed.append(slide_number)
+            
+            if changed is None or changed:
+                entries.update(self._process_slides(changed))
+        finally:
+            # Release the package's file handle; the rest only uses the entries
+            self.pptx_extractor.close()
+            self.pptx_extractor = None
+        
+        if manifest_path:
+            self._save_manifest(manifest_path, [entries[n] for n in sorted(entries)])
+        
+        # Abbreviation handling is cheap and depends on the whole deck, so it always runs.
+        # Definitions found in the deck apply to every slide of this deck only.
+        abbreviation_dict = self.abbreviation_handler.deck_dictionary(
+            text
+            for entry in entries.values()
+            for text in (entry["source_text"], entry.get("notes", ""))
+        )
+        
+        processed_content = []
+        for slide_number in sorted(entries):
+            entry = entries[slide_number]
+            highlighted_text, abbreviations = self.abbreviation_handler.highlight_abbreviations(
+                entry["source_text"], abbreviation_dict
+            )
+            
+            processed_content.append({
+                "slide_number": slide_number,
+                "slide_type": entry["slide_type"],
+                "text": highlighted_text,
+                "abbreviations": abbreviations,
+                "images": entry["images"],
+                "notes": entry.get("notes", ""),
+                "validation_results": entry["validation_results"]
+            })
+        
+        return processed_content
+
+    def _process_slides(self, slide_numbers: Optional[List[int]] = None) -> Dict[int, Dict]:
+        """
+        Run extraction, classification and validation for the given slides
+        (all slides when slide_numbers is None)
+        
+        Slides are consumed from the extractor's single-pass stream and processed
+        in batches of config["slide_batch_size"], so only one batch of slide
+        records is held at a time.
+        
+        Images are classified straight from the bytes in the package. They are
+        only written to disk when config["image_export_dir"] is set, or, with
+        config["spill_images_to_disk"], to a per-run temporary directory that is
+        removed afterwards.
+        
+        Returns:
+            Dictionary of slide number to manifest entry
+        """
+        export_dir = self.config["image_export_dir"]
+        spill_dir = None
+        if not export_dir and self.config["spill_images_to_disk"]:
+            spill_dir = tempfile.mkdtemp(prefix="storyboard_images_")
+        output_dir = export_dir or spill_dir
+        
+        entries = {}
+        image_results = {}
+        batch = []
+        
+        try:
+            for record in self.pptx_extractor.iter_slides(
+                output_dir, slide_numbers, keep_image_data=output_dir is None
+            ):
+                batch.append(record)
+                if len(batch) >= self.config["slide_batch_size"]:
+                    entries.update(self._process_batch(batch, image_results, spill_dir is not None))
+                    batch = []
+            
+            if batch:
+                entries.update(self._process_batch(batch, image_results, spill_dir is not None))
+        finally:
+            if spill_dir:
+                shutil.rmtree(spill_dir, ignore_errors=True)
+        
+        return entries
+
+    def _process_batch(self, records: List[Dict], image_results: Dict[str, Dict],
+                       discard_paths: bool = False) -> Dict[int, Dict]:
+        """
+        Classify and validate one batch of slide records
+        
+        Args:
+            records: Slide records from the extractor's iter_slides
+            image_results: Image classifications of this deck keyed by content hash;
+                updated with the images first seen in this batch
+            discard_paths: Drop image paths that point into a temporary directory
+        """
+        # Classify and validate all slides of the batch at once
+        slide_types = self.slide_classifier.get_slide_types(records)
+        validation_results = self.content_validator.validate_deck([record["text"] for record in records])
+        
+        # Classify each image not seen earlier in the deck once (ResNet is only
+        # loaded when the deck actually contains images)
+        new_sources = {
+            img["hash"]: img["data"] if "data" in img else img["path"]
+            for record in records
+            for img in record["images"]
+            if img["hash"] not in image_results
+        }
+        if new_sources:
+            image_results.update(zip(
+                new_sources,
+                self.image_classifier.classify_images(list(new_sources.values()))
+            ))
+        
+        entries = {}
+        for record, slide_type, validation in zip(records, slide_types, validation_results):
+            for img in record["images"]:
+                img["semantic_type"] = image_results[img["hash"]]
+                # Release the image bytes as soon as they are classified
+                img.pop("data", None)
+                if discard_paths:
+                    img["path"] = None
+            
+            entries[record["slide_number"]] = {
+                "slide_number": record["slide_number"],
+                "fingerprint": record["fingerprint"],
+                "source_text": record["text"],
+                "notes": record["notes"],
+                "slide_type": slide_type,
+                "images": record["images"],
+                "validation_results": validation
+            }
+        
+        return entries
+
+    def _renumber_entry(self, entry: Dict, slide_number: int) -> Dict:
+        """Adapt a manifest entry to the slide's current position in the deck"""
+        entry = dict(entry, slide_number=slide_number)
+        entry["slide_type"] = tuple(entry["slide_type"])
+        entry["images"] = [dict(img, slide_number=slide_number) for img in entry["images"]]
+        return entry
+
+    def _manifest_signature(self) -> Dict[str, str]:
+        """Settings that invalidate every manifest entry when they change"""
+        return {
+            "version": 4,
+            "extraction_engine": self.config["extraction_engine"],
+            # Reused entries keep their image paths, which depend on where images were exported
+            "image_export_dir": self.config["image_export_dir"],
+            "slide_model": self.slide_classifier.cache_model_id,
+            "slide_rules": json.dumps(self.slide_classifier.rules, sort_keys=True),
+            "image_model": self.image_classifier.model_id,
+            "entity_model": self.content_validator.cache_model_id,
+            "near_matches": json.dumps(self.content_validator.near_match_settings, sort_keys=True),
+            "restricted_terms": json.dumps(
+                {k: sorted(v) for k, v in self.content_validator.restricted_terms.items()},
+                sort_keys=True
+            )
+        }
+
+    def _load_manifest(self, manifest_path: str) -> Dict[str, Dict]:
+        """Load manifest entries keyed by slide fingerprint"""
+        if not os.path.exists(manifest_path):
+            return {}
+        
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        
+        if manifest.get("signature") != self._manifest_signature():
+            return {}
+        
+        return {entry["fingerprint"]: entry for entry in manifest.get("slides", [])}
+
+    def _save_manifest(self, manifest_path: str, entries: List[Dict]):
+        """Write the manifest atomically so an interrupted run never leaves it half written"""
+        manifest_dir = os.path.dirname(manifest_path)
+        if manifest_dir:
+            os.makedirs(manifest_dir, exist_ok=True)
+        
+        tmp_path = temp_path(manifest_path)
+        with open(tmp_path, 'w') as f:
+            json.dump({"signature": self._manifest_signature(), "slides": entries}, f)
+        os.replace(tmp_path, manifest_path)
+
+    def generate_storyboard(self, processed_content: Dict, output_path: str):
+        """
+        Generate storyboard document from processed content
+        """
+        # Copy of the template (or the default template), parsed once per process
+        doc = template_cache.document(self.config["template_path"])
+        
+        # Create contents chapters table
+        self._create_contents_table(doc, processed_content)
+        
+        # Create abbreviations table
+        self._create_abbreviations_table(doc, processed_content)
+        
+        # Create content tables for each slide, cloned from one prebuilt table
+        slide_table = self._slide_table_template(doc)
+        for slide in processed_content:
+            self._create_slide_content_table(doc, slide, slide_table)
+        
+        # Create question tables if applicable
+        question_table = None
+        for slide in processed_content:
+            if slide["slide_type"][0] == "quiz":
+                if question_table is None:
+                    question_table = self._question_table_template(doc)
+                self._create_question_table(doc, slide, question_table)
+        
+        # Save document
+        doc.save(output_path)
+
+    def _create_contents_table(self, doc: "Document", content: Dict):
+        """Create table of contents"""
+        table = doc.add_table(rows=1, cols=2)
+        table.style = 'Table Grid'
+        table.rows[0].cells[0].text = "Chapter"
+        table.rows[0].cells[1].text = "Subchapter"
+        
+        # TODO: Implement chapter organization logic
+
+    def _create_abbreviations_table(self, doc: "Document", content: List[Dict]):
+        """Create a table of the abbreviations used in the deck"""
+        used = {}
+        for slide in content:
+            used.update(slide["abbreviations"])
+        abbrev_list = self.abbreviation_handler.create_abbreviations_table(used)
+        if abbrev_list:
+            table = doc.add_table(rows=1, cols=2)
+            table.style = 'Table Grid'
+            table.rows[0].cells[0].text = "Abbreviation"
+            table.rows[0].cells[1].text = "Definition"
+            
+            add_rows(table, (
+                (abbrev["abbreviation"], abbrev["definition"]) for abbrev in abbrev_list
+            ))
+
+    def _slide_table_template(self, doc: "Document") -> TableTemplate:
+        """Slide content table with its row headers filled in"""
+        table = doc.add_table(rows=len(SLIDE_TABLE_HEADERS), cols=2)
+        table.style = 'Table Grid'
+        for row, header in zip(table.rows, SLIDE_TABLE_HEADERS):
+            row.cells[0].text = header
+        return TableTemplate(table)
+
+    def _create_slide_content_table(self, doc: "Document", slide: Dict,
+                                    template: Optional[TableTemplate] = None):
+        """
+        Create content table for a slide
+        
+        Args:
+            template: Table from _slide_table_template to clone; pass one when
+                writing many slides
+        """
+        if template is None:
+            template = self._slide_table_template(doc)
+        
+        # Content column, one entry per row of SLIDE_TABLE_HEADERS
+        contents = [
+            "",  # To be filled based on content organization
+            "",
+            slide["text"],
+            self._format_image_info(slide["images"]),
+            self._format_visual_details(slide),
+            "",  # To be filled based on slide type
+            "",  # To be extracted from slide content
+            ""
+        ]
+        template.add([(None, content) for content in contents])
+
+    def _question_table_template(self, doc: "Document") -> TableTemplate:
+        table = doc.add_table(rows=1, cols=2)
+        table.style = 'Table Grid'
+        return TableTemplate(table)
+
+    def _create_question_table(self, doc: "Document", slide: Dict,
+                               template: Optional[TableTemplate] = None):
+        """Create table for quiz questions"""
+        if slide["slide_type"][0] != "quiz":
+            return
+        
+        if template is None:
+            template = self._question_table_template(doc)
+        template.add()
+        # TODO: Implement question table formatting
+
+    def _format_image_info(self, images: List[Dict]) -> str:
+        """Format image information for the table"""
+        if not images:
+            return "No images"
+            
+        return "\n".join(
+            f"Image {idx+1}: {img['semantic_type']['predicted_type']} "
+            f"({img['dimensions']})"
+            for idx, img in enumerate(images)
+        )
+
+    def _format_visual_details(self, slide: Dict) -> str:
+        """Format visual details for the table"""
+        details = []
+        if slide["images"]:
+            details.append("Contains visual elements:")
+            for img in slide["images"]:
+                details.append(f"- {img['semantic_type']['predicted_type']}")
+        
+        return "\n".join(details) if details else "No specific visual details"
+
+    def save_config(self, path: str):
+        """Save current configuration"""
+        with open(path, 'w') as f:
+            json.dump(self.config, f, indent=2)
+
+    def load_config(self, path: str):
+        """Load configuration"""
+        with open(path, 'r') as f:
             self.config.update(json.load(f)) 
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Heuristic image labels: trivial artwork is labelled without the CNN, while
+charts and diagrams with few colours still go to the network
+"""
+
+import os
+import sys
+import unittest
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.image_classifier import HybridImageClassifier
+
+
+def bar_chart(width: int = 800, height: int = 600) -> Image.Image:
+    """Two-series bar chart on white with black axes"""
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    draw.line([(60, 40), (60, height - 60), (width - 40, height - 60)], fill="black", width=3)
+    for i, (first, second) in enumerate([(300, 220), (180, 260), (400, 340), (250, 120)]):
+        x = 100 + i * 170
+        draw.rectangle([x, height - 60 - first, x + 60, height - 61], fill=(31, 119, 180))
+        draw.rectangle([x + 65, height - 60 - second, x + 125, height - 61], fill=(255, 127, 14))
+    return img
+
+
+def transparent_diagram(width: int = 700, height: int = 500) -> Image.Image:
+    """Boxes joined by arrows on a transparent canvas, five colours"""
+    img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    boxes = [((40, 200, 200, 300), (66, 133, 244, 255)),
+             ((270, 60, 430, 160), (52, 168, 83, 255)),
+             ((270, 340, 430, 440), (251, 188, 5, 255)),
+             ((500, 200, 660, 300), (234, 67, 53, 255))]
+    for box, colour in boxes:
+        draw.rectangle(box, fill=colour)
+    for start, end in [((200, 250), (270, 110)), ((200, 250), (270, 390)),
+                       ((430, 110), (500, 250)), ((430, 390), (500, 250))]:
+        draw.line([start, end], fill=(0, 0, 0, 255), width=4)
+    return img
+
+
+class HeuristicLabelTest(unittest.TestCase):
+    def setUp(self):
+        self.classifier = HybridImageClassifier()
+
+    def tearDown(self):
+        self.classifier.close()
+
+    def label(self, img: Image.Image):
+        """Heuristic label when confident enough to skip the CNN, otherwise None"""
+        label, confidence = self.classifier._heuristic_label(img, img.size)
+        return label if label and confidence >= self.classifier.heuristic_threshold else None
+
+    def test_bar_chart_goes_to_network(self):
+        self.assertIsNone(self.label(bar_chart()))
+        self.assertIsNone(self.label(bar_chart(400, 300)))
+
+    def test_transparent_diagram_goes_to_network(self):
+        self.assertIsNone(self.label(transparent_diagram()))
+
+    def test_opaque_diagram_goes_to_network(self):
+        diagram = Image.new("RGB", (700, 500), "white")
+        diagram.paste(transparent_diagram(), mask=transparent_diagram())
+        self.assertIsNone(self.label(diagram))
+
+    def test_uniform_fill_is_shape(self):
+        self.assertEqual(self.label(Image.new("RGB", (400, 300), (0, 84, 166))), "shape")
+
+    def test_large_fill_goes_to_network(self):
+        self.assertIsNone(self.label(Image.new("RGB", (1920, 1080), (0, 84, 166))))
+
+    def test_divider_is_shape(self):
+        self.assertEqual(self.label(Image.new("RGB", (1200, 12), "grey")), "shape")
+
+    def test_small_images_are_icons(self):
+        self.assertEqual(self.label(Image.new("RGB", (48, 48), "red")), "icon")
+
+    def test_small_transparent_artwork_is_logo(self):
+        logo = Image.new("RGBA", (240, 240), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(logo)
+        draw.ellipse((20, 20, 220, 220), fill=(0, 84, 166, 255))
+        draw.rectangle((90, 60, 150, 180), fill=(255, 255, 255, 255))
+        self.assertEqual(self.label(logo), "logo")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,136 +1,275 @@
-"""
-Abbreviation Handler
-Detects and manages abbreviations in medical/scientific content
-"""
-
-import re
-from typing import Dict, List, Set, Tuple
-import spacy
-import json
-import os
-
-class AbbreviationHandler:
-    def __init__(self, custom_dict_path: str = None):
-        """
-        Initialize the abbreviation handler
-        
-        Args:
-            custom_dict_path: Path to custom abbreviations dictionary
-        """
-        # Load spaCy model for text processing
-        self.nlp = spacy.load("en_core_web_sm")
-        
-        # Common medical/scientific abbreviations
-        self.known_abbreviations = {
-            "FDA": "Food and Drug Administration",
-            "EMA": "European Medicines Agency",
-            "RCT": "Randomized Controlled Trial",
-            # Add more common abbreviations
-        }
-        
-        # Load custom abbreviations if available
-        if custom_dict_path and os.path.exists(custom_dict_path):
-            with open(custom_dict_path, 'r') as f:
-                custom_abbrevs = json.load(f)
-                self.known_abbreviations.update(custom_abbrevs)
-
-    def find_abbreviations(self, text: str) -> List[Tuple[str, str]]:
-        """
-        Find abbreviations and their definitions in text
-        
-        Returns:
-            List of tuples (abbreviation, definition)
-        """
-        abbreviations = []
-        
-        # Pattern for abbreviations in parentheses
-        pattern = r'\(([A-Z][A-Za-z0-9]+)\)'
-        matches = re.finditer(pattern, text)
-        
-        for match in matches:
-            abbrev = match.group(1)
-            # Look for definition before the abbreviation
-            context_before = text[:match.start()].strip()
-            words = context_before.split()[-6:]  # Look at last 6 words
-            
-            if words:
-                # Try to match capital letters in abbreviation with words
-                definition = self._find_definition(abbrev, ' '.join(words))
-                if definition:
-                    abbreviations.append((abbrev, definition))
-        
-        return abbreviations
-
-    def _find_definition(self, abbrev: str, text: str) -> str:
-        """
-        Find the definition of an abbreviation in the given text
-        """
-        words = text.split()
-        abbrev_chars = list(abbrev.lower())
-        
-        # Try to match first letters of words with abbreviation
-        matched_words = []
-        word_idx = len(words) - 1
-        char_idx = len(abbrev_chars) - 1
-        
-        while char_idx >= 0 and word_idx >= 0:
-            if words[word_idx].lower().startswith(abbrev_chars[char_idx]):
-                matched_words.insert(0, words[word_idx])
-                char_idx -= 1
-            word_idx -= 1
-        
-        if len(matched_words) == len(abbrev):
-            return ' '.join(matched_words)
-        
-        return None
-
-    def highlight_abbreviations(self, text: str) -> Tuple[str, Dict[str, str]]:
-        """
-        Highlight abbreviations in text and return mapping
-        
-        Returns:
-            Tuple of (highlighted_text, abbreviation_dict)
-        """
-        highlighted_text = text
-        abbrev_dict = {}
-        
-        # Find all abbreviations
-        found_abbrevs = self.find_abbreviations(text)
-        
-        # Add known abbreviations
-        for abbrev, definition in found_abbrevs:
-            self.known_abbreviations[abbrev] = definition
-        
-        # Highlight all known abbreviations in text
-        for abbrev in self.known_abbreviations:
-            pattern = r'\b' + re.escape(abbrev) + r'\b'
-            highlighted_text = re.sub(
-                pattern,
-                lambda m: f'<mark>{m.group()}</mark>',
-                highlighted_text
-            )
-            abbrev_dict[abbrev] = self.known_abbreviations[abbrev]
-        
-        return highlighted_text, abbrev_dict
-
-    def create_abbreviations_table(self) -> List[Dict[str, str]]:
-        """
-        Create a table of all found abbreviations
-        
-        Returns:
-            List of dictionaries with abbreviation and definition
-        """
-        return [
-            {"abbreviation": abbrev, "definition": defn}
-            for abbrev, defn in sorted(self.known_abbreviations.items())
-        ]
-
-    def save_abbreviations(self, path: str):
-        """Save the current abbreviations dictionary"""
-        with open(path, 'w') as f:
-            json.dump(self.known_abbreviations, f, indent=2)
-
-    def load_abbreviations(self, path: str):
-        """Load custom abbreviations dictionary"""
-        with open(path, 'r') as f:
+"""
+Abbreviation Handler
+Detects and manages abbreviations in medical/scientific content
+"""
+
+import bisect
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import json
+import os
+
+# Words (parentheses split words), parenthesized text, and sentence/line boundaries
+_WORD = re.compile(r'[^\s()]+')
+_PARENTHESIS = re.compile(r'\(([^()]{1,100})\)')
+_LINE_BREAK = re.compile(r'[\n\v]')
+_SENTENCE_END = '.!?;:'
+# Punctuation stripped from candidate short and long forms
+_TRIM = ' \t\n\v,;:"\'[]'
+
+
+def _max_long_form_words(short_form: str) -> int:
+    """Longest definition considered for a short form, in words (Schwartz & Hearst)"""
+    return min(len(short_form) + 5, len(short_form) * 2)
+
+
+def _is_short_form(candidate: str) -> bool:
+    """Plausible abbreviation: 2-10 characters, at most two words, with a capital letter"""
+    return (
+        2 <= len(candidate) <= 10
+        and len(candidate.split()) <= 2
+        and candidate[0].isalnum()
+        and any(char.isupper() for char in candidate)
+    )
+
+
+def _trie_pattern(words) -> str:
+    """
+    Regex alternation of words, factored into a trie
+    
+    Shared prefixes are matched once, so the cost of a match attempt depends on
+    the length of the text at that position rather than the number of words.
+    Optional groups are greedy, so the longest word that fits is preferred.
+    """
+    trie = {}
+    for word in words:
+        if not word:
+            continue
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        # The empty key marks the end of a word
+        node[""] = {}
+    
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        is_end = "" in node
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if is_end else "")
+    
+    return build(trie)
+
+
+class AbbreviationHandler:
+    def __init__(self, custom_dict_path: str = None):
+        """
+        Initialize the abbreviation handler
+        
+        Args:
+            custom_dict_path: Path to custom abbreviations dictionary
+        """
+        # Common medical/scientific abbreviations
+        self.known_abbreviations = {
+            "FDA": "Food and Drug Administration",
+            "EMA": "European Medicines Agency",
+            "RCT": "Randomized Controlled Trial",
+            # Add more common abbreviations
+        }
+        
+        # Load custom abbreviations if available
+        if custom_dict_path and os.path.exists(custom_dict_path):
+            with open(custom_dict_path, 'r') as f:
+                custom_abbrevs = json.load(f)
+                self.known_abbreviations.update(custom_abbrevs)
+        
+        # Compiled matchers by dictionary keys, most recently used last; the
+        # known dictionary's matcher is reused as long as its keys don't change
+        self._matchers = OrderedDict()
+        self.max_matchers = 4
+
+    def find_abbreviations(self, text: str) -> List[Tuple[str, str]]:
+        """
+        Find abbreviations and their definitions in text
+        
+        Uses the Schwartz-Hearst algorithm: definitions are recognized both as
+        "long form (SF)" and "SF (long form)". The text is tokenized once, so the
+        cost is linear in its length.
+        
+        Returns:
+            List of tuples (abbreviation, definition), in order of appearance
+        """
+        # Word spans, and for each word the index of the first word of its sentence
+        spans = [match.span() for match in _WORD.finditer(text)]
+        if not spans:
+            return []
+        ends = [end for _, end in spans]
+        sentence_start = [0] * len(spans)
+        for i in range(1, len(spans)):
+            prev_end = spans[i - 1][1]
+            boundary = text[prev_end - 1] in _SENTENCE_END or _LINE_BREAK.search(text, prev_end, spans[i][0])
+            sentence_start[i] = i if boundary else sentence_start[i - 1]
+        
+        abbreviations = []
+        for match in _PARENTHESIS.finditer(text):
+            # Words ending before the opening parenthesis
+            last = bisect.bisect_right(ends, match.start()) - 1
+            if last < 0:
+                continue
+            
+            inner = re.split(r'[;,]', match.group(1))[0].strip()
+            inner_words = inner.split()
+            if not inner_words:
+                continue
+            
+            if len(inner_words) <= 2 and len(inner) <= 10:
+                # long form (SF)
+                short_form = inner
+                first = max(sentence_start[last], last - _max_long_form_words(short_form) + 1)
+                candidate = text[spans[first][0]:spans[last][1]]
+            else:
+                # SF (long form)
+                short_form = text[spans[last][0]:spans[last][1]].strip(_TRIM)
+                candidate = inner
+                if len(inner_words) > _max_long_form_words(short_form):
+                    continue
+            
+            if not _is_short_form(short_form):
+                continue
+            definition = self._find_definition(short_form, candidate)
+            if definition:
+                abbreviations.append((short_form, definition))
+        
+        return abbreviations
+
+    def _find_definition(self, abbrev: str, text: str) -> Optional[str]:
+        """
+        Find the shortest long form at the end of text that contains the
+        abbreviation's characters in order, with its first character starting a word
+        """
+        text = text.strip(_TRIM)
+        s_idx = len(abbrev) - 1
+        l_idx = len(text) - 1
+        
+        while s_idx >= 0:
+            char = abbrev[s_idx].lower()
+            if not char.isalnum():
+                s_idx -= 1
+                continue
+            # The first character of the abbreviation must start a word
+            while l_idx >= 0 and (
+                text[l_idx].lower() != char
+                or (s_idx == 0 and l_idx > 0 and text[l_idx - 1].isalnum())
+            ):
+                l_idx -= 1
+            if l_idx < 0:
+                return None
+            l_idx -= 1
+            s_idx -= 1
+        
+        definition = text[text.rfind(' ', 0, l_idx + 1) + 1:]
+        if len(definition) <= len(abbrev) or definition == abbrev:
+            return None
+        return definition
+
+    def find_deck_abbreviations(self, texts: Iterable[str]) -> Dict[str, str]:
+        """
+        Abbreviations defined anywhere in a deck
+        
+        Args:
+            texts: Text of every slide (and notes) of the deck
+            
+        Returns:
+            Dictionary of abbreviation -> definition; the first definition of an
+            abbreviation wins
+        """
+        found = {}
+        for text in texts:
+            for abbrev, definition in self.find_abbreviations(text):
+                found.setdefault(abbrev, definition)
+        return found
+
+    def deck_dictionary(self, texts: Iterable[str]) -> Dict[str, str]:
+        """
+        Known abbreviations plus those defined in the deck
+        
+        The result belongs to the deck; known_abbreviations is not modified, so
+        definitions don't carry over from one deck to the next.
+        """
+        return {**self.known_abbreviations, **self.find_deck_abbreviations(texts)}
+
+    def _compiled_matcher(self, keys: Iterable[str]) -> Optional["re.Pattern"]:
+        """Single regex matching every abbreviation in keys as a whole word"""
+        keys = frozenset(keys)
+        if keys not in self._matchers:
+            self._matchers[keys] = (
+                re.compile(r'\b' + _trie_pattern(keys) + r'\b') if keys else None
+            )
+            # Keep the matchers of the last few dictionaries only
+            while len(self._matchers) > self.max_matchers:
+                self._matchers.popitem(last=False)
+        else:
+            self._matchers.move_to_end(keys)
+        return self._matchers[keys]
+
+    def highlight_abbreviations(self, text: str,
+                                abbreviations: Optional[Dict[str, str]] = None) -> Tuple[str, Dict[str, str]]:
+        """
+        Highlight abbreviations in text and return mapping
+        
+        Args:
+            text: Text to highlight
+            abbreviations: Dictionary to highlight (e.g. from deck_dictionary);
+                defaults to the known abbreviations plus those defined in text
+        
+        Returns:
+            Tuple of (highlighted_text, abbreviation_dict) where abbreviation_dict
+            holds the abbreviations that occur in the text
+        """
+        if abbreviations is None:
+            abbreviations = self.deck_dictionary([text])
+        
+        # Highlight all abbreviations in one scan; where entries overlap
+        # (e.g. "HIV" and "HIV-1") the longest one is marked
+        matcher = self._compiled_matcher(abbreviations)
+        if matcher is None:
+            return text, {}
+        
+        used = {}
+        
+        def mark(match):
+            used[match.group()] = abbreviations[match.group()]
+            return f'<mark>{match.group()}</mark>'
+        
+        return matcher.sub(mark, text), used
+
+    def create_abbreviations_table(self, abbreviations: Optional[Dict[str, str]] = None) -> List[Dict[str, str]]:
+        """
+        Create a table of abbreviations
+        
+        Args:
+            abbreviations: Abbreviations to list (e.g. those used in a deck);
+                defaults to the known abbreviations
+        
+        Returns:
+            List of dictionaries with abbreviation and definition
+        """
+        if abbreviations is None:
+            abbreviations = self.known_abbreviations
+        return [
+            {"abbreviation": abbrev, "definition": defn}
+            for abbrev, defn in sorted(abbreviations.items())
+        ]
+
+    def save_abbreviations(self, path: str):
+        """Save the current abbreviations dictionary"""
+        with open(path, 'w') as f:
+            json.dump(self.known_abbreviations, f, indent=2)
+
+    def load_abbreviations(self, path: str):
+        """Load custom abbreviations dictionary"""
+        with open(path, 'r') as f:
             self.known_abbreviations.update(json.load(f)) 
\ No newline at end of file
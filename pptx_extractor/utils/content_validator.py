@@ -1,131 +1,421 @@
-"""
-Content Validator
-Checks content for brand names, company names, and other restricted content
-"""
-
-import re
-from typing import Dict, List, Set, Tuple
-import spacy
-import json
-import os
-from sentence_transformers import SentenceTransformer
-import numpy as np
-
-class ContentValidator:
-    def __init__(self, custom_lists_path: str = None):
-        """
-        Initialize the content validator
-        
-        Args:
-            custom_lists_path: Path to custom lists of restricted terms
-        """
-        # Load spaCy for named entity recognition
-        self.nlp = spacy.load("en_core_web_sm")
-        
-        # Load BGE-M3 for semantic similarity
-        self.model = SentenceTransformer("BAAI/bge-m3")
-        
-        # Initialize restricted terms
-        self.restricted_terms = {
-            "companies": set(),
-            "brands": set(),
-            "products": set()
-        }
-        
-        # Load custom lists if available
-        if custom_lists_path and os.path.exists(custom_lists_path):
-            with open(custom_lists_path, 'r') as f:
-                custom_lists = json.load(f)
-                for category in self.restricted_terms:
-                    if category in custom_lists:
-                        self.restricted_terms[category].update(custom_lists[category])
-
-    def validate_content(self, text: str) -> Dict[str, List[Dict[str, any]]]:
-        """
-        Validate content for restricted terms and return findings
-        
-        Returns:
-            Dictionary with categories and their findings
-        """
-        findings = {
-            "companies": [],
-            "brands": [],
-            "products": [],
-            "other": []
-        }
-        
-        # Check for exact matches
-        for category, terms in self.restricted_terms.items():
-            for term in terms:
-                pattern = r'\b' + re.escape(term) + r'\b'
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                for match in matches:
-                    findings[category].append({
-                        "term": term,
-                        "context": self._get_context(text, match.start(), match.end()),
-                        "position": (match.start(), match.end())
-                    })
-        
-        # Use spaCy for named entity recognition
-        doc = self.nlp(text)
-        for ent in doc.ents:
-            if ent.label_ in ["ORG", "PRODUCT"]:
-                findings["other"].append({
-                    "term": ent.text,
-                    "type": ent.label_,
-                    "context": self._get_context(text, ent.start_char, ent.end_char),
-                    "position": (ent.start_char, ent.end_char)
-                })
-        
-        return findings
-
-    def _get_context(self, text: str, start: int, end: int, context_window: int = 50) -> str:
-        """Get context around a matched term"""
-        context_start = max(0, start - context_window)
-        context_end = min(len(text), end + context_window)
-        return text[context_start:context_end]
-
-    def suggest_replacements(self, term: str) -> List[str]:
-        """
-        Suggest generic replacements for restricted terms
-        """
-        generic_terms = {
-            "company": ["healthcare company", "pharmaceutical company", "biotech company"],
-            "brand": ["medication", "treatment", "therapy"],
-            "product": ["medical device", "therapeutic option", "treatment option"]
-        }
-        
-        # Encode the term
-        term_embedding = self.model.encode([term])[0]
-        
-        # Find most similar generic terms
-        suggestions = []
-        for category, replacements in generic_terms.items():
-            replacement_embeddings = self.model.encode(replacements)
-            similarities = np.dot(replacement_embeddings, term_embedding)
-            best_idx = np.argmax(similarities)
-            suggestions.append(replacements[best_idx])
-        
-        return suggestions
-
-    def add_restricted_term(self, term: str, category: str):
-        """Add a new restricted term"""
-        if category in self.restricted_terms:
-            self.restricted_terms[category].add(term)
-
-    def remove_restricted_term(self, term: str, category: str):
-        """Remove a restricted term"""
-        if category in self.restricted_terms:
-            self.restricted_terms[category].discard(term)
-
-    def save_restricted_terms(self, path: str):
-        """Save the current restricted terms"""
-        with open(path, 'w') as f:
-            json.dump({k: list(v) for k, v in self.restricted_terms.items()}, f, indent=2)
-
-    def load_restricted_terms(self, path: str):
-        """Load restricted terms"""
-        with open(path, 'r') as f:
-            terms = json.load(f)
-            for category, terms_list in terms.items():
-                self.restricted_terms[category] = set(terms_list) 
\ No newline at end of file
+"""
+Content Validator
+Checks content for brand names, company names, and other restricted content
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+import json
+import os
+import re
+import numpy as np
+
+from models.model_registry import shared_sentence_transformer, shared_spacy
+from utils.result_cache import ResultCache, content_hash
+from utils.term_index import TermIndex
+from utils.term_matcher import TermMatcher
+
+
+def _package_version(package: str) -> str:
+    try:
+        from importlib.metadata import version
+        return version(package)
+    except Exception:
+        return "unknown"
+
+
+# Pipeline components that don't contribute to doc.ents
+_NER_UNUSED_COMPONENTS = ("tagger", "parser", "lemmatizer", "attribute_ruler")
+
+# Entity labels that are never restricted terms
+_NUMERIC_ENTITY_LABELS = {"DATE", "TIME", "PERCENT", "MONEY", "QUANTITY", "ORDINAL", "CARDINAL"}
+
+# Generic wording suggested in place of restricted terms, by kind of term
+DEFAULT_REPLACEMENTS = {
+    "company": ["healthcare company", "pharmaceutical company", "biotech company"],
+    "brand": ["medication", "treatment", "therapy"],
+    "product": ["medical device", "therapeutic option", "treatment option"]
+}
+
+# Runs of up to four capitalized words, e.g. "Zolexa XR" or "Acme Pharma"
+_CAPITALIZED_RUN = re.compile(r"\b[A-Z][\w'-]*(?:[ \t]+[A-Z][\w'-]*){0,3}")
+
+
+class ContentValidator:
+    def __init__(self, custom_lists_path: str = None, model_name: str = "BAAI/bge-m3",
+                 device: Optional[str] = None, cache: Optional[ResultCache] = None,
+                 backend: str = "fp32", onnx_dir: Optional[str] = None,
+                 ner_batch_size: int = 64, ner_n_process: int = 1,
+                 term_index_dir: Optional[str] = None,
+                 similarity_threshold: Optional[float] = 0.8,
+                 ngram_threshold: Optional[float] = 0.6, near_match_top_k: int = 3,
+                 replacements_path: str = None):
+        """
+        Initialize the content validator
+        
+        Args:
+            custom_lists_path: Path to custom lists of restricted terms
+            ner_batch_size: Texts per nlp.pipe batch
+            ner_n_process: Processes used by nlp.pipe for named entity recognition
+            term_index_dir: Directory to keep the restricted-term embedding index in
+                (None keeps it in memory and rebuilds it per process)
+            similarity_threshold: Minimum embedding similarity of a near match
+                (None disables the embedding check)
+            ngram_threshold: Minimum character n-gram similarity of a near match
+                (None disables the n-gram check)
+            near_match_top_k: Near matches reported per phrase and method
+            replacements_path: Path to a replacement vocabulary (kind -> phrases)
+                used instead of DEFAULT_REPLACEMENTS
+        """
+        # Shared spaCy pipeline for named entity recognition
+        self._nlp_handle = shared_spacy("en_core_web_sm")
+        self.ner_batch_size = ner_batch_size
+        self.ner_n_process = ner_n_process
+        
+        # Optional persistent cache of entity results, keyed by text hash and pipeline version
+        self.cache = cache
+        self.cache_model_id = f"en_core_web_sm-{_package_version('en_core_web_sm')}@1"
+        
+        # Shared BGE-M3 model for semantic similarity
+        self._model_handle = shared_sentence_transformer(model_name, device, backend, onnx_dir)
+        
+        # Near matches of restricted terms (misspellings, inflections, paraphrases)
+        self.similarity_threshold = similarity_threshold
+        self.ngram_threshold = ngram_threshold
+        self.near_match_top_k = near_match_top_k
+        self._term_index = TermIndex(term_index_dir, f"{model_name}:{backend}")
+        self._term_index_stale = True
+        
+        # Initialize restricted terms
+        self.restricted_terms = {
+            "companies": set(),
+            "brands": set(),
+            "products": set()
+        }
+        
+        # Load custom lists if available
+        if custom_lists_path and os.path.exists(custom_lists_path):
+            with open(custom_lists_path, 'r') as f:
+                custom_lists = json.load(f)
+                for category in self.restricted_terms:
+                    if category in custom_lists:
+                        self.restricted_terms[category].update(custom_lists[category])
+        
+        # Replacement vocabulary; its embeddings are computed on first use
+        self.replacements = {kind: list(phrases) for kind, phrases in DEFAULT_REPLACEMENTS.items()}
+        self._replacement_embeddings = None
+        if replacements_path and os.path.exists(replacements_path):
+            self.load_replacements(replacements_path)
+        
+        # All restricted terms compiled into one automaton; kept in sync by
+        # add_restricted_term, remove_restricted_term and load_restricted_terms
+        self._term_matcher = TermMatcher(self.restricted_terms)
+
+    @property
+    def nlp(self):
+        return self._nlp_handle.get()
+
+    @property
+    def model(self):
+        return self._model_handle.get()
+
+    def close(self):
+        """Release the shared models"""
+        self._nlp_handle.release()
+        self._model_handle.release()
+
+    @property
+    def near_match_settings(self) -> Dict[str, Optional[float]]:
+        """Settings that change which near matches are reported"""
+        return {
+            "similarity_threshold": self.similarity_threshold,
+            "ngram_threshold": self.ngram_threshold,
+            "top_k": self.near_match_top_k,
+            "model": self._term_index.model_id
+        }
+
+    def validate_content(self, text: str) -> Dict[str, List[Dict[str, any]]]:
+        """
+        Validate content for restricted terms and return findings
+        
+        Returns:
+            Dictionary with categories and their findings
+        """
+        return self.validate_deck([text])[0]
+
+    def validate_deck(self, texts: List[str]) -> List[Dict[str, List[Dict[str, any]]]]:
+        """
+        Validate many texts (e.g. every slide of a deck) at once
+        
+        Named entities for all texts are recognized in batches with nlp.pipe,
+        and the candidate phrases of all texts are checked for near matches of
+        restricted terms in one pass.
+        
+        Returns:
+            One findings dictionary (as returned by validate_content) per text, in input order
+        """
+        all_entities = self._entities_many(texts)
+        all_near_matches = self._near_matches_many(texts, all_entities)
+        
+        all_findings = []
+        for text, entities, near_matches in zip(texts, all_entities, all_near_matches):
+            findings = {
+                "companies": [],
+                "brands": [],
+                "products": [],
+                "other": [],
+                "near_matches": near_matches
+            }
+            
+            # Check for exact matches of every term in one scan
+            for start, end, term, category in self._term_matcher.find_all(text):
+                findings[category].append({
+                    "term": term,
+                    "context": self._get_context(text, start, end),
+                    "position": (start, end)
+                })
+            
+            # Named entities from spaCy
+            for ent_text, label, start, end in entities:
+                if label in ["ORG", "PRODUCT"]:
+                    findings["other"].append({
+                        "term": ent_text,
+                        "type": label,
+                        "context": self._get_context(text, start, end),
+                        "position": (start, end)
+                    })
+            
+            all_findings.append(findings)
+        
+        return all_findings
+
+    def _entities_many(self, texts: List[str]) -> List[List[Tuple[str, str, int, int]]]:
+        """
+        Named entities as (text, label, start_char, end_char) for each text
+        
+        Cached results are reused. The remaining distinct texts go through one
+        nlp.pipe call with the components NER doesn't need disabled.
+        """
+        digests = [content_hash(text) for text in texts]
+        results = {}
+        if self.cache is not None:
+            results = {
+                digest: [tuple(ent) for ent in cached]
+                for digest, cached in self.cache.get_json_many(
+                    "spacy_entities", self.cache_model_id, digests
+                ).items()
+            }
+        
+        missing = {}
+        for digest, text in zip(digests, texts):
+            if digest not in results and digest not in missing:
+                missing[digest] = text
+        
+        if missing:
+            disable = [name for name in _NER_UNUSED_COMPONENTS if name in self.nlp.pipe_names]
+            # The pipeline is shared with other threads (server slots); pipe()
+            # is lazy, so the documents are consumed while holding the lock
+            with self._nlp_handle.use_lock:
+                docs = self.nlp.pipe(
+                    missing.values(), batch_size=self.ner_batch_size,
+                    n_process=self.ner_n_process, disable=disable
+                )
+                for digest, doc in zip(missing, docs):
+                    entities = [
+                        (ent.text, ent.label_, ent.start_char, ent.end_char)
+                        for ent in doc.ents
+                    ]
+                    results[digest] = entities
+            if self.cache is not None:
+                self.cache.put_json_many(
+                    "spacy_entities", self.cache_model_id,
+                    {digest: results[digest] for digest in missing}
+                )
+        
+        return [results[digest] for digest in digests]
+
+    def _candidate_phrases(self, text: str,
+                           entities: List[Tuple[str, str, int, int]]) -> List[Tuple[str, int, int]]:
+        """
+        Phrases that may name a company, brand or product, as (phrase, start, end)
+        
+        Named entities plus runs of capitalized words; this stands in for noun
+        chunks, which would need the dependency parser NER runs without.
+        """
+        spans = {
+            (start, end) for _, label, start, end in entities
+            if label not in _NUMERIC_ENTITY_LABELS
+        }
+        spans.update(match.span() for match in _CAPITALIZED_RUN.finditer(text))
+        
+        phrases = []
+        for start, end in sorted(spans):
+            phrase = text[start:end].strip()
+            if len(phrase) >= 3:
+                phrases.append((phrase, start, end))
+        return phrases
+
+    @property
+    def near_matches_enabled(self) -> bool:
+        return self.similarity_threshold is not None or self.ngram_threshold is not None
+
+    @property
+    def term_index(self) -> TermIndex:
+        """The restricted-term index, with terms added since the last check encoded"""
+        if self._term_index_stale:
+            self._term_index.sync(self.restricted_terms, self._encode_terms)
+            self._term_index_stale = False
+        return self._term_index
+
+    def _encode_terms(self, terms: List[str]) -> np.ndarray:
+        return self.model.encode(terms, batch_size=64, normalize_embeddings=True,
+                                 convert_to_numpy=True, show_progress_bar=False)
+
+    def _near_matches_many(self, texts: List[str],
+                           all_entities: List[List[Tuple[str, str, int, int]]]) -> List[List[Dict[str, any]]]:
+        """
+        Near matches of restricted terms for each text
+        
+        Every distinct candidate phrase of the batch is encoded once and compared
+        with the whole term index in one matrix multiply; phrases are also looked
+        up in the character n-gram index. Exact matches are left to the term matcher.
+        """
+        results = [[] for _ in texts]
+        if not self.near_matches_enabled:
+            return results
+        if not any(self.restricted_terms.values()):
+            return results
+        
+        index = self.term_index
+        occurrences = [self._candidate_phrases(text, entities)
+                       for text, entities in zip(texts, all_entities)]
+        phrases = list(dict.fromkeys(
+            phrase for text_phrases in occurrences for phrase, _, _ in text_phrases
+        ))
+        if not phrases:
+            return results
+        
+        # (term, score, method) per phrase; a term found by both methods keeps its best score
+        matches: Dict[str, Dict[str, Tuple[float, str]]] = {phrase: {} for phrase in phrases}
+        if self.similarity_threshold is not None:
+            embeddings = self._encode_terms(phrases)
+            for phrase, phrase_matches in zip(phrases, index.semantic_matches(
+                    embeddings, self.near_match_top_k, self.similarity_threshold)):
+                for term, score in phrase_matches:
+                    matches[phrase][term] = (score, "semantic")
+        if self.ngram_threshold is not None:
+            for phrase in phrases:
+                for term, score in index.ngram_matches(phrase, self.ngram_threshold, self.near_match_top_k):
+                    if score > matches[phrase].get(term, (-1.0, None))[0]:
+                        matches[phrase][term] = (score, "ngram")
+        
+        # Terms the exact matcher finds in a phrase (on word boundaries) are
+        # already reported; "Acmeplex" still counts as a near match of "Acme"
+        for phrase, phrase_matches in matches.items():
+            for _, _, term, _ in self._term_matcher.find_all(phrase):
+                phrase_matches.pop(term, None)
+        
+        for text, text_phrases, text_results in zip(texts, occurrences, results):
+            for phrase, start, end in text_phrases:
+                for term, (score, method) in sorted(matches[phrase].items(), key=lambda item: -item[1][0]):
+                    text_results.append({
+                        "term": term,
+                        "categories": index.categories.get(term, []),
+                        "phrase": phrase,
+                        "score": round(score, 4),
+                        "method": method,
+                        "context": self._get_context(text, start, end),
+                        "position": (start, end)
+                    })
+        return results
+
+    def _get_context(self, text: str, start: int, end: int, context_window: int = 50) -> str:
+        """Get context around a matched term"""
+        context_start = max(0, start - context_window)
+        context_end = min(len(text), end + context_window)
+        return text[context_start:context_end]
+
+    def suggest_replacements(self, term: str) -> List[str]:
+        """
+        Suggest generic replacements for restricted terms
+        
+        Returns:
+            The closest replacement of each kind in the vocabulary
+        """
+        return self.suggest_replacements_many([term])[0]
+
+    def suggest_replacements_many(self, terms: List[str]) -> List[List[str]]:
+        """
+        Suggest replacements for many terms with one encode and one matrix multiply
+        
+        Returns:
+            For each term, the closest replacement of each kind in the vocabulary
+        """
+        if not terms:
+            return []
+        
+        phrases, kinds, replacement_embeddings = self._replacement_matrix()
+        if not phrases:
+            return [[] for _ in terms]
+        term_embeddings = self._encode_terms(list(terms))
+        similarities = term_embeddings @ replacement_embeddings.T
+        
+        suggestions = [[] for _ in terms]
+        for start, end in kinds:
+            best = start + np.argmax(similarities[:, start:end], axis=1)
+            for term_suggestions, idx in zip(suggestions, best):
+                term_suggestions.append(phrases[idx])
+        return suggestions
+
+    def _replacement_matrix(self) -> Tuple[List[str], List[Tuple[int, int]], np.ndarray]:
+        """
+        Replacement phrases, the (start, end) rows of each kind, and their
+        normalized embeddings, encoded once per vocabulary
+        """
+        if self._replacement_embeddings is None:
+            phrases, kinds = [], []
+            for kind_phrases in self.replacements.values():
+                if kind_phrases:
+                    kinds.append((len(phrases), len(phrases) + len(kind_phrases)))
+                    phrases.extend(kind_phrases)
+            embeddings = self._encode_terms(phrases) if phrases else np.zeros((0, 0), dtype=np.float32)
+            self._replacement_embeddings = (phrases, kinds, embeddings)
+        return self._replacement_embeddings
+
+    def load_replacements(self, path: str):
+        """Load a replacement vocabulary (kind -> phrases), replacing the current one"""
+        with open(path, 'r') as f:
+            self.replacements = {kind: list(phrases) for kind, phrases in json.load(f).items()}
+        self._replacement_embeddings = None
+
+    def save_replacements(self, path: str):
+        """Save the current replacement vocabulary"""
+        with open(path, 'w') as f:
+            json.dump(self.replacements, f, indent=2)
+
+    def add_restricted_term(self, term: str, category: str):
+        """Add a new restricted term"""
+        if category in self.restricted_terms:
+            self.restricted_terms[category].add(term)
+            self._term_matcher.add(term, category)
+            self._term_index_stale = True
+
+    def remove_restricted_term(self, term: str, category: str):
+        """Remove a restricted term"""
+        if category in self.restricted_terms:
+            self.restricted_terms[category].discard(term)
+            self._term_matcher.remove(term, category)
+            self._term_index_stale = True
+
+    def save_restricted_terms(self, path: str):
+        """Save the current restricted terms"""
+        with open(path, 'w') as f:
+            json.dump({k: list(v) for k, v in self.restricted_terms.items()}, f, indent=2)
+
+    def load_restricted_terms(self, path: str):
+        """Load restricted terms"""
+        with open(path, 'r') as f:
+            terms = json.load(f)
+            for category, terms_list in terms.items():
+                self.restricted_terms[category] = set(terms_list)
+        self._term_matcher = TermMatcher(self.restricted_terms)
+        self._term_index_stale = True
\ No newline at end of file
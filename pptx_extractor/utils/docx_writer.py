@@ -0,0 +1,149 @@
+"""
+DOCX Writer
+Bulk table construction for storyboard documents: tables and rows are cloned
+from templates built once through python-docx and filled through their XML
+elements, so rows and cells are never looked up through the python-docx API.
+Template documents are parsed once per process and cloned for every output.
+"""
+
+import os
+import threading
+from copy import deepcopy
+from io import BytesIO
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from utils.result_cache import content_hash
+
+
+def set_cell_text(tc, text: str):
+    """Replace the content of a <w:tc> with text, exactly as python-docx's _Cell.text does"""
+    tc.clear_content()
+    tc.add_p().add_r().text = text
+
+
+def _fill(tr, texts: Sequence[Optional[str]]):
+    for tc, text in zip(tr.tc_lst, texts):
+        if text is not None:
+            set_cell_text(tc, text)
+
+
+class TableTemplate:
+    """
+    A table built once through python-docx, then cloned for every use
+
+    The table passed in is detached from the document; each add() appends a
+    deep copy of it with the given cell text, producing the same XML as
+    building that table through the python-docx API.
+    """
+
+    def __init__(self, table):
+        """
+        Args:
+            table: docx Table, as returned by Document.add_table
+        """
+        self._tbl = table._tbl
+        self._body = self._tbl.getparent()
+        self._body.remove(self._tbl)
+
+    def add(self, rows: Sequence[Sequence[Optional[str]]] = ()):
+        """
+        Append a copy of the table at the end of the document body
+
+        Args:
+            rows: Text of each cell, row by row; None (or a missing row or
+                cell) keeps the template's content
+
+        Returns:
+            The new <w:tbl> element
+        """
+        tbl = deepcopy(self._tbl)
+        for tr, texts in zip(tbl.tr_lst, rows):
+            _fill(tr, texts)
+        self._body._insert_tbl(tbl)
+        return tbl
+
+
+def add_rows(table, rows: Iterable[Sequence[str]]):
+    """
+    Append rows of text to a table
+
+    Equivalent to calling table.add_row() and setting the text of each cell,
+    but the row is built once and cloned.
+    """
+    tbl = table._tbl
+    template = None
+    for texts in rows:
+        if template is None:
+            row = table.add_row()
+            template = deepcopy(row._tr)
+            tr = row._tr
+        else:
+            tr = deepcopy(template)
+            tbl.append(tr)
+        _fill(tr, texts)
+
+
+class TemplateCache:
+    """
+    Parsed template documents, kept pristine and deep-copied for every output
+
+    Each document() call checks the template file's modification time and
+    size. When either changed, the file is hashed, and it is parsed again only
+    if its content did change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Absolute path (None for python-docx's default template) -> ((mtime_ns, size), digest, Document)
+        self._templates: Dict[Optional[str], Tuple[Optional[Tuple[int, int]], Optional[str], object]] = {}
+
+    def document(self, path: Optional[str] = None):
+        """
+        A new Document based on the template at path
+
+        Args:
+            path: Template .docx file; None for python-docx's default template
+
+        Returns:
+            A docx Document the caller may modify freely
+        """
+        key = os.path.abspath(path) if path else None
+        with self._lock:
+            pristine = self._load(key)
+        # The pristine document is never modified, so it can be copied unlocked
+        return deepcopy(pristine)
+
+    def _load(self, path: Optional[str]):
+        from docx import Document
+
+        cached = self._templates.get(path)
+        if path is None:
+            if cached is None:
+                cached = self._templates[None] = (None, None, Document())
+            return cached[2]
+
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if cached is not None and cached[0] == signature:
+            return cached[2]
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = content_hash(data)
+        if cached is not None and cached[1] == digest:
+            # Touched or copied over with the same content
+            self._templates[path] = (signature, digest, cached[2])
+            return cached[2]
+
+        document = Document(BytesIO(data))
+        self._templates[path] = (signature, digest, document)
+        return document
+
+    def clear(self):
+        """Drop every cached template"""
+        with self._lock:
+            self._templates.clear()
+
+
+# Process-wide template cache shared by all generators
+template_cache = TemplateCache()
@@ -0,0 +1,228 @@
+"""
+Image Probe
+Reads image format and dimensions from file headers without decoding pixels,
+including the vector formats (EMF, WMF, SVG) that Pillow cannot size
+"""
+
+import re
+import struct
+from typing import Optional, Tuple, Union
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+# Pixels per unit for SVG lengths, at the CSS resolution of 96 dpi
+_SVG_UNITS = {
+    "": 1.0,
+    "px": 1.0,
+    "pt": 96.0 / 72.0,
+    "pc": 16.0,
+    "in": 96.0,
+    "cm": 96.0 / 2.54,
+    "mm": 96.0 / 25.4
+}
+
+_SVG_ROOT = re.compile(rb"<svg\b[^>]*>", re.IGNORECASE | re.DOTALL)
+_SVG_ATTRIBUTE = re.compile(r'([\w:-]+)\s*=\s*(["\'])(.*?)\2', re.DOTALL)
+_SVG_LENGTH = re.compile(r"^\s*([0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*([a-z]*)\s*$")
+
+# JPEG start-of-frame markers carry the image size (DHT, JPG and DAC share the range)
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _probe_png(data: bytes) -> Optional[Tuple[int, int]]:
+    if len(data) >= 24 and data[12:16] == b"IHDR":
+        return struct.unpack(">II", data[16:24])
+    return None
+
+
+def _probe_gif(data: bytes) -> Optional[Tuple[int, int]]:
+    if len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    return None
+
+
+def _probe_bmp(data: bytes) -> Optional[Tuple[int, int]]:
+    if len(data) < 26:
+        return None
+    header_size = struct.unpack("<I", data[14:18])[0]
+    if header_size == 12:
+        return struct.unpack("<HH", data[18:22])
+    width, height = struct.unpack("<ii", data[18:26])
+    return abs(width), abs(height)
+
+
+def _probe_jpeg(data: bytes) -> Optional[Tuple[int, int]]:
+    pos = 2
+    size = len(data)
+    while pos + 4 <= size:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # Fill byte
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            # Standalone markers carry no length
+            pos += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image or start of scan before any frame header
+            return None
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if pos + 9 > size:
+                return None
+            height, width = struct.unpack(">HH", data[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def _probe_tiff(data: bytes) -> Optional[Tuple[int, int]]:
+    endian = "<" if data[:2] == b"II" else ">"
+    if len(data) < 8:
+        return None
+    offset = struct.unpack(endian + "I", data[4:8])[0]
+    if offset + 2 > len(data):
+        return None
+    count = struct.unpack(endian + "H", data[offset:offset + 2])[0]
+    width = height = None
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(data):
+            break
+        tag, field_type = struct.unpack(endian + "HH", data[entry:entry + 4])
+        if tag not in (256, 257):
+            continue
+        if field_type == 3:
+            value = struct.unpack(endian + "H", data[entry + 8:entry + 10])[0]
+        elif field_type == 4:
+            value = struct.unpack(endian + "I", data[entry + 8:entry + 12])[0]
+        else:
+            continue
+        if tag == 256:
+            width = value
+        else:
+            height = value
+    if width is None or height is None:
+        return None
+    return width, height
+
+
+def _probe_webp(data: bytes) -> Optional[Tuple[int, int]]:
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        b0, b1, b2, b3 = data[21:25]
+        width = 1 + (((b1 & 0x3F) << 8) | b0)
+        height = 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6))
+        return width, height
+    if chunk == b"VP8X":
+        width = 1 + int.from_bytes(data[24:27], "little")
+        height = 1 + int.from_bytes(data[27:30], "little")
+        return width, height
+    return None
+
+
+def _probe_emf(data: bytes) -> Optional[Tuple[int, int]]:
+    # EMR_HEADER bounds in device units, as Pillow reports them
+    left, top, right, bottom = struct.unpack("<iiii", data[8:24])
+    return right - left, bottom - top
+
+
+def _probe_wmf(data: bytes) -> Optional[Tuple[int, int]]:
+    # Placeable WMF header: bounding box in logical units plus units per inch
+    if len(data) < 16:
+        return None
+    left, top, right, bottom, inch = struct.unpack("<hhhhH", data[6:16])
+    if not inch:
+        return None
+    return (right - left) * 72 // inch, (bottom - top) * 72 // inch
+
+
+def _svg_length(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    match = _SVG_LENGTH.match(value)
+    if not match or match.group(2) not in _SVG_UNITS:
+        # Percentages and unknown units have no intrinsic size
+        return None
+    return float(match.group(1)) * _SVG_UNITS[match.group(2)]
+
+
+def _probe_svg(data: bytes) -> Optional[Tuple[int, int]]:
+    root = _SVG_ROOT.search(data[:65536])
+    if not root:
+        return None
+    tag = root.group(0).decode("utf-8", "replace")
+    attributes = {
+        name.lower(): value
+        for name, _, value in _SVG_ATTRIBUTE.findall(tag)
+    }
+
+    width = _svg_length(attributes.get("width"))
+    height = _svg_length(attributes.get("height"))
+    view_box = attributes.get("viewbox")
+    if view_box:
+        parts = re.split(r"[\s,]+", view_box.strip())
+        if len(parts) == 4:
+            try:
+                box_width, box_height = float(parts[2]), float(parts[3])
+            except ValueError:
+                box_width = box_height = 0.0
+            if box_width > 0 and box_height > 0:
+                # Fill in a missing dimension from the viewBox aspect ratio
+                if width is None and height is None:
+                    width, height = box_width, box_height
+                elif width is None:
+                    width = height * box_width / box_height
+                elif height is None:
+                    height = width * box_height / box_width
+
+    if width is None or height is None:
+        return None
+    return int(round(width)), int(round(height))
+
+
+def probe_image(data: Buffer) -> Optional[Tuple[str, int, int]]:
+    """
+    Identify an image from its header
+
+    Args:
+        data: Encoded image (only the first bytes are inspected for raster formats)
+
+    Returns:
+        Tuple of (format, width, height), with Pillow-style format names, or None
+        if the format is not recognized or the header is truncated
+    """
+    head = bytes(data[:32])
+    try:
+        if head.startswith(b"\x89PNG\r\n\x1a\n"):
+            size, name = _probe_png(head), "PNG"
+        elif head.startswith(b"\xff\xd8"):
+            size, name = _probe_jpeg(bytes(data)), "JPEG"
+        elif head[:6] in (b"GIF87a", b"GIF89a"):
+            size, name = _probe_gif(head), "GIF"
+        elif head.startswith(b"BM"):
+            size, name = _probe_bmp(head), "BMP"
+        elif head[:4] in (b"II*\x00", b"MM\x00*"):
+            size, name = _probe_tiff(bytes(data)), "TIFF"
+        elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            size, name = _probe_webp(head), "WEBP"
+        elif head[:4] == b"\x01\x00\x00\x00" and bytes(data[40:44]) == b" EMF":
+            size, name = _probe_emf(bytes(data[:44])), "EMF"
+        elif head[:4] == b"\xd7\xcd\xc6\x9a":
+            size, name = _probe_wmf(head), "WMF"
+        else:
+            size, name = _probe_svg(bytes(data)), "SVG"
+    except struct.error:
+        return None
+
+    if size is None:
+        return None
+    return name, size[0], size[1]
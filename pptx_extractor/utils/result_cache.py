@@ -0,0 +1,230 @@
+"""
+Result Cache
+Persistent on-disk cache for embeddings, image classifications and NER results,
+keyed by content hash plus model identifier and version
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+
+def content_hash(data: Union[str, bytes, bytearray, memoryview]) -> str:
+    """SHA-256 hex digest of text or binary content"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def temp_path(path: str) -> str:
+    """
+    Name for a temporary file that is renamed to path once written, unique to
+    this process and thread so concurrent writers never share it
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 ** 3):
+        """
+        Initialize the result cache
+
+        Args:
+            cache_dir: Directory holding the SQLite index and the .npy array store
+            max_bytes: Size bound; least recently used entries are evicted beyond it
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.arrays_dir = os.path.join(cache_dir, "arrays")
+        os.makedirs(self.arrays_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(cache_dir, "cache.sqlite3"),
+            timeout=30,
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT,"
+            " nbytes INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        self._conn.commit()
+
+        # Size of the entries, counted once and then kept up to date by stores
+        # and evictions, so writes don't have to sum the table
+        self._total_bytes = self._total_from_db()
+        # last_access updates of recent reads, written in batches
+        self._pending_access: Dict[str, float] = {}
+        self.max_pending_access = 1024
+
+    @staticmethod
+    def make_key(namespace: str, model_id: str, digest: str) -> str:
+        """Build the cache key for a piece of content under a given model"""
+        return hashlib.sha256(f"{namespace}\0{model_id}\0{digest}".encode("utf-8")).hexdigest()
+
+    def _array_path(self, key: str) -> str:
+        return os.path.join(self.arrays_dir, f"{key}.npy")
+
+    def _lookup(self, keys: List[str]) -> Dict[str, tuple]:
+        rows = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for key, kind, payload in self._conn.execute(
+                    f"SELECT key, kind, payload FROM entries WHERE key IN ({placeholders})", chunk
+                ):
+                    rows[key] = (kind, payload)
+            # Access times are written with the next store (or flush), not per read
+            now = time.time()
+            for key in rows:
+                self._pending_access[key] = now
+            if len(self._pending_access) >= self.max_pending_access:
+                self._flush_access()
+                self._conn.commit()
+        return rows
+
+    def _flush_access(self):
+        """Write deferred last_access updates (the caller commits)"""
+        if self._pending_access:
+            self._conn.executemany(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                [(when, key) for key, when in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+
+    def _store_many(self, entries: List[tuple]):
+        """Insert (key, kind, payload, nbytes) entries in one transaction"""
+        if not entries:
+            return
+        with self._lock:
+            # Entries being replaced no longer count towards the total
+            keys = [entry[0] for entry in entries]
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for (nbytes,) in self._conn.execute(
+                    f"SELECT nbytes FROM entries WHERE key IN ({placeholders})", chunk
+                ):
+                    self._total_bytes -= nbytes
+
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, kind, payload, nbytes, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(key, kind, payload, nbytes, now) for key, kind, payload, nbytes in entries]
+            )
+            self._total_bytes += sum(entry[3] for entry in entries)
+            self._flush_access()
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _total_from_db(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries").fetchone()[0]
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes (the caller commits)"""
+        # Other processes sharing the cache add entries too; recount before evicting
+        total = self._total_bytes = self._total_from_db()
+        if total <= self.max_bytes:
+            return
+
+        # Evict down to 90% so we don't evict on every insert
+        target = int(self.max_bytes * 0.9)
+        # Walk the LRU index only as far as needed instead of loading the table
+        evicted = []
+        cursor = self._conn.execute("SELECT key, kind, nbytes FROM entries ORDER BY last_access")
+        for key, kind, nbytes in cursor:
+            if total <= target:
+                break
+            evicted.append(key)
+            total -= nbytes
+            if kind == "array":
+                try:
+                    os.remove(self._array_path(key))
+                except OSError:
+                    pass
+        cursor.close()
+
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in evicted])
+        self._total_bytes = total
+
+    def get_json(self, namespace: str, model_id: str, digest: str) -> Optional[Any]:
+        """Get a JSON-serializable result, or None on a miss"""
+        return self.get_json_many(namespace, model_id, [digest]).get(digest)
+
+    def get_json_many(self, namespace: str, model_id: str, digests: Iterable[str]) -> Dict[str, Any]:
+        """Get JSON results for many digests; misses are absent from the result"""
+        keys = {self.make_key(namespace, model_id, d): d for d in digests}
+        return {
+            keys[key]: json.loads(payload)
+            for key, (kind, payload) in self._lookup(list(keys)).items()
+            if kind == "json"
+        }
+
+    def put_json(self, namespace: str, model_id: str, digest: str, value: Any):
+        """Store a JSON-serializable result"""
+        self.put_json_many(namespace, model_id, {digest: value})
+
+    def put_json_many(self, namespace: str, model_id: str, values: Dict[str, Any]):
+        """Store JSON results for many digests in one transaction"""
+        entries = []
+        for digest, value in values.items():
+            payload = json.dumps(value)
+            entries.append((self.make_key(namespace, model_id, digest), "json", payload, len(payload)))
+        self._store_many(entries)
+
+    def get_array(self, namespace: str, model_id: str, digest: str) -> Optional[np.ndarray]:
+        """Get a memory-mapped array, or None on a miss"""
+        return self.get_array_many(namespace, model_id, [digest]).get(digest)
+
+    def get_array_many(self, namespace: str, model_id: str, digests: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Get memory-mapped arrays for many digests; misses are absent from the result"""
+        keys = {self.make_key(namespace, model_id, d): d for d in digests}
+        arrays = {}
+        for key, (kind, _) in self._lookup(list(keys)).items():
+            if kind != "array":
+                continue
+            try:
+                arrays[keys[key]] = np.load(self._array_path(key), mmap_mode="r")
+            except (OSError, ValueError):
+                # Array file removed behind our back; treat as a miss
+                continue
+        return arrays
+
+    def put_array(self, namespace: str, model_id: str, digest: str, array: np.ndarray):
+        """Store an array in the .npy store"""
+        self.put_array_many(namespace, model_id, {digest: array})
+
+    def put_array_many(self, namespace: str, model_id: str, arrays: Dict[str, np.ndarray]):
+        """Store arrays for many digests, indexing them in one transaction"""
+        entries = []
+        for digest, array in arrays.items():
+            key = self.make_key(namespace, model_id, digest)
+            path = self._array_path(key)
+            tmp_path = temp_path(path)
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+            entries.append((key, "array", None, int(array.nbytes)))
+        self._store_many(entries)
+
+    def close(self):
+        with self._lock:
+            self._flush_access()
+            self._conn.commit()
+            self._conn.close()
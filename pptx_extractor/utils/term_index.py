@@ -0,0 +1,207 @@
+"""
+Term Index
+Embedding and character n-gram indexes over restricted terms, used to flag
+misspelled, abbreviated or paraphrased mentions the exact matcher misses
+"""
+
+import json
+import os
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.result_cache import temp_path
+from utils.term_matcher import _fold
+
+# Encodes texts to an embedding matrix (one row per text)
+Encoder = Callable[[List[str]], np.ndarray]
+
+
+def _ngrams(text: str, size: int) -> Set[str]:
+    """Character n-grams of the case-folded text, padded so word edges count"""
+    padded = f" {_fold(text)} "
+    if len(padded) <= size:
+        return {padded}
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+class TermIndex:
+    """
+    Normalized embedding matrix of every restricted term plus a character
+    n-gram index for fuzzy candidates
+
+    With a directory, the matrix is saved as embeddings.npy and memory-mapped
+    on load; sync() only encodes terms that are not in the index yet.
+    """
+
+    def __init__(self, directory: Optional[str], model_id: str, ngram_size: int = 3):
+        """
+        Args:
+            directory: Where the index is stored (None keeps it in memory)
+            model_id: Identifier of the embedding model; a stored index built
+                with another model is discarded
+            ngram_size: Character n-gram length
+        """
+        self.directory = directory
+        self.model_id = model_id
+        self.ngram_size = ngram_size
+
+        self.terms: List[str] = []
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.categories: Dict[str, List[str]] = {}
+        self._ngram_postings: Dict[str, List[int]] = {}
+        self._ngram_counts: List[int] = []
+
+        if directory:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _paths(self) -> Tuple[str, str]:
+        return (os.path.join(self.directory, "terms.json"),
+                os.path.join(self.directory, "embeddings.npy"))
+
+    def _load(self):
+        terms_path, matrix_path = self._paths()
+        if not (os.path.exists(terms_path) and os.path.exists(matrix_path)):
+            return
+        with open(terms_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get("model_id") != self.model_id:
+            return
+        embeddings = np.load(matrix_path, mmap_mode='r')
+        if embeddings.shape[0] != len(meta["terms"]):
+            return
+        self.terms = meta["terms"]
+        self.embeddings = embeddings
+        self._build_ngrams()
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        terms_path, matrix_path = self._paths()
+
+        # The matrix is written first, then the term list that validates it.
+        # Temporary files are per process and thread: workers sharing a cache
+        # directory may build the same index at the same time.
+        tmp_matrix = temp_path(matrix_path)
+        with open(tmp_matrix, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        os.replace(tmp_matrix, matrix_path)
+        tmp_terms = temp_path(terms_path)
+        with open(tmp_terms, 'w') as f:
+            json.dump({"model_id": self.model_id, "terms": self.terms}, f)
+        os.replace(tmp_terms, terms_path)
+
+        self.embeddings = np.load(matrix_path, mmap_mode='r')
+
+    def _build_ngrams(self):
+        postings = defaultdict(list)
+        counts = []
+        for row, term in enumerate(self.terms):
+            grams = _ngrams(term, self.ngram_size)
+            counts.append(len(grams))
+            for gram in grams:
+                postings[gram].append(row)
+        self._ngram_postings = dict(postings)
+        self._ngram_counts = counts
+
+    def sync(self, terms: Dict[str, Iterable[str]], encode: Encoder) -> int:
+        """
+        Bring the index up to date with the current restricted terms
+
+        Args:
+            terms: Dictionary of category -> terms
+            encode: Encoder for terms that are not in the index yet
+
+        Returns:
+            Number of terms that had to be encoded
+        """
+        categories = defaultdict(set)
+        for category, category_terms in terms.items():
+            for term in category_terms:
+                if term.strip():
+                    categories[term].add(category)
+        self.categories = {term: sorted(cats) for term, cats in categories.items()}
+
+        current = set(self.terms)
+        added = sorted(set(categories) - current)
+        removed = current - set(categories)
+        if not added and not removed:
+            return 0
+
+        keep = [row for row, term in enumerate(self.terms) if term not in removed]
+        kept_terms = [self.terms[row] for row in keep]
+        kept_embeddings = np.asarray(self.embeddings[keep], dtype=np.float32) if keep else None
+
+        if added:
+            new_embeddings = np.asarray(encode(added), dtype=np.float32)
+            norms = np.linalg.norm(new_embeddings, axis=1, keepdims=True)
+            new_embeddings = new_embeddings / np.clip(norms, 1e-12, None)
+            if kept_embeddings is not None:
+                new_embeddings = np.vstack([kept_embeddings, new_embeddings])
+        else:
+            new_embeddings = kept_embeddings
+
+        self.terms = kept_terms + added
+        self.embeddings = (
+            new_embeddings if new_embeddings is not None
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+        if self.directory:
+            self._save()
+        self._build_ngrams()
+        return len(added)
+
+    def semantic_matches(self, phrase_embeddings: np.ndarray, top_k: int = 3,
+                         threshold: float = 0.8) -> List[List[Tuple[str, float]]]:
+        """
+        Most similar terms for each phrase, with one matrix multiply for the batch
+
+        Args:
+            phrase_embeddings: Normalized phrase embeddings, one row per phrase
+            top_k: Maximum number of terms per phrase
+            threshold: Minimum cosine similarity
+
+        Returns:
+            For each phrase, a list of (term, score) with the best match first
+        """
+        if not len(self.terms) or not len(phrase_embeddings):
+            return [[] for _ in range(len(phrase_embeddings))]
+
+        similarities = np.asarray(phrase_embeddings, dtype=np.float32) @ self.embeddings.T
+        k = min(top_k, similarities.shape[1])
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+
+        results = []
+        for row, candidates in enumerate(top):
+            scores = similarities[row, candidates]
+            order = np.argsort(-scores)
+            results.append([
+                (self.terms[candidates[i]], float(scores[i]))
+                for i in order
+                if scores[i] >= threshold
+            ])
+        return results
+
+    def ngram_matches(self, phrase: str, threshold: float = 0.6,
+                      top_k: int = 3) -> List[Tuple[str, float]]:
+        """
+        Terms sharing many character n-grams with phrase (Dice coefficient)
+
+        Returns:
+            List of (term, score) with the best match first
+        """
+        grams = _ngrams(phrase, self.ngram_size)
+        hits = Counter()
+        for gram in grams:
+            hits.update(self._ngram_postings.get(gram, ()))
+
+        scored = []
+        for row, shared in hits.items():
+            score = 2 * shared / (len(grams) + self._ngram_counts[row])
+            if score >= threshold:
+                scored.append((self.terms[row], score))
+        scored.sort(key=lambda item: -item[1])
+        return scored[:top_k]
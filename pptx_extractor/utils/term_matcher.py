@@ -0,0 +1,177 @@
+"""
+Term Matcher
+Aho-Corasick automaton that finds every occurrence of many terms in one pass,
+case-insensitively and on word boundaries
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# (start, end, term, category)
+TermMatch = Tuple[int, int, str, str]
+
+
+def _is_word(char: str) -> bool:
+    """Same definition of a word character as the re module's \\w"""
+    return char.isalnum() or char == '_'
+
+
+def _fold_char(char: str) -> str:
+    """
+    Case-fold one character the way re.IGNORECASE compares characters
+
+    Characters are equal when their lowercase forms are, or when they share an
+    uppercase form ("ſ" and "s", "ς" and "σ"). The result is always one
+    character, so match positions map directly to the original text.
+    """
+    lower = char.lower()
+    if len(lower) > 1:
+        # Only "İ" lowercases to several characters; re uses its simple mapping "i"
+        lower = lower[0]
+    upper = lower.upper()
+    if len(upper) == 1:
+        folded = upper.lower()
+        if len(folded) == 1:
+            return folded
+    return lower
+
+
+def _fold(text: str) -> str:
+    return "".join(_fold_char(char) for char in text)
+
+
+class TermMatcher:
+    """
+    Finds restricted terms by category in a single scan of the text
+
+    A term matches where `re.search(r'\\b' + re.escape(term) + r'\\b', text,
+    re.IGNORECASE)` would: case-insensitively, with a word boundary on both sides.
+    Occurrences of different terms may overlap (e.g. "Acme" and "Acme Pharma");
+    occurrences of the same term don't, as with re.finditer.
+
+    Terms can be added and removed at any time. Additions only extend the trie;
+    the failure links are recomputed on the next scan. Removals take effect
+    immediately.
+    """
+
+    def __init__(self, terms: Optional[Dict[str, Iterable[str]]] = None):
+        """
+        Args:
+            terms: Dictionary of category -> terms
+        """
+        # Trie of folded terms: transitions, failure links and the terms ending at each node
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[Set[Tuple[str, str]]] = [set()]
+        # Nearest node on the failure chain that had outputs when links were built
+        self._output_link: List[int] = [-1]
+        self._dirty = False
+        self._fold_cache: Dict[str, str] = {}
+
+        for category, category_terms in (terms or {}).items():
+            for term in category_terms:
+                self.add(term, category)
+
+    def __len__(self) -> int:
+        return sum(len(outputs) for outputs in self._outputs)
+
+    def _node_for(self, folded: str, create: bool) -> Optional[int]:
+        node = 0
+        for char in folded:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                if not create:
+                    return None
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(set())
+                self._output_link.append(-1)
+                self._goto[node][char] = next_node
+            node = next_node
+        return node
+
+    def add(self, term: str, category: str):
+        """Start matching term under category"""
+        if not term:
+            return
+        node = self._node_for(_fold(term), create=True)
+        if (term, category) not in self._outputs[node]:
+            self._outputs[node].add((term, category))
+            self._dirty = True
+
+    def remove(self, term: str, category: str):
+        """Stop matching term under category"""
+        if not term:
+            return
+        node = self._node_for(_fold(term), create=False)
+        if node is not None:
+            # Nodes stay in the trie; an output-less node on a chain yields nothing
+            self._outputs[node].discard((term, category))
+
+    def _build_links(self):
+        """Recompute failure and output links breadth-first"""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._output_link[child] = -1
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._output_link[child] = fail if self._outputs[fail] else self._output_link[fail]
+                queue.append(child)
+
+        self._dirty = False
+
+    def find_all(self, text: str) -> List[TermMatch]:
+        """
+        Find all term occurrences in text
+
+        Returns:
+            List of (start, end, term, category), ordered by position
+        """
+        if self._dirty:
+            self._build_links()
+
+        goto, fail, outputs, output_link = self._goto, self._fail, self._outputs, self._output_link
+        fold_cache = self._fold_cache
+        length = len(text)
+        matches = []
+        # End of the last accepted occurrence of each term, to skip self-overlaps
+        last_end: Dict[Tuple[str, str], int] = {}
+
+        node = 0
+        for pos, char in enumerate(text):
+            folded = fold_cache.get(char)
+            if folded is None:
+                folded = fold_cache[char] = _fold_char(char)
+
+            while node and folded not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(folded, 0)
+
+            candidate = node if outputs[node] else output_link[node]
+            while candidate > 0:
+                for term, category in outputs[candidate]:
+                    end = pos + 1
+                    start = end - len(term)
+                    if last_end.get((term, category), -1) > start:
+                        continue
+                    # \b on both sides of the match
+                    before = start > 0 and _is_word(text[start - 1])
+                    after = end < length and _is_word(text[end])
+                    if before == _is_word(text[start]) or after == _is_word(text[end - 1]):
+                        continue
+                    last_end[(term, category)] = end
+                    matches.append((start, end, term, category))
+                candidate = output_link[candidate]
+
+        matches.sort(key=lambda match: (match[0], match[1]))
+        return matches